@@ -1,24 +1,95 @@
 
 import streamlit as st
 from sections.intro import display_intro
-from utils.io import load_data
-from utils.prep import prepare_data, categorize_power
-from utils.filters import display_logical_filters
+from utils.io import DATA_PATH
+from utils.cache import load_prepared_data, dataset_version
+from utils.incremental import refresh_prepared_data, INCREMENTAL_INGEST
+from utils.shared import load_shared_data, dataset_view, SHARED_DATASET
+from utils.cube import build_cube
+from utils.map_grid import MapGrid
+from utils.filters import display_logical_filters, summary_kpis, get_filter_cache
+from utils.sketch import dataset_summary
+from utils.render import section_data, seed_section_cache, get_section_cache
+from utils.artifacts import get_artifacts, artifacts_for
+from utils.build import sample_rows
+from utils.perf import timed, start_rerun, display_perf_panel
 from utils.viz import display_top_departements_chart, display_carte_by_depart, display_top_op, camembert_op,evolution_nb_bornes,display_overview_tab, display_datapreprocessing, display_top_operators_by_department_chart, display_operator_comparator_tab
 from sections.conclusion import display_conclusion_tab
 
 st.set_page_config(page_title="Dashboard Bornes de Recharge", layout="wide")
+start_rerun()
 
 
+@timed
 @st.cache_data
 def get_cleaned_data():
-    df_raw = load_data(path="data/station_electrique.csv")
-
-    df_prepared = prepare_data(df_raw)
+    # Réutilise le parquet préparé sur disque si le CSV, le GeoJSON et le code de prep n'ont pas changé
+    if INCREMENTAL_INGEST:
+        # nouvelle publication du CSV : seules les lignes ajoutées ou modifiées sont re-préparées
+        return refresh_prepared_data(DATA_PATH)
+    df_prepared = load_prepared_data(DATA_PATH)
     return df_prepared
 
 
-df = get_cleaned_data()
+@timed
+def get_dataset():
+    # Build hors ligne (python -m utils.build) : dataset, index et agrégats mappés en mémoire,
+    # sans lecture du CSV ni préparation au démarrage. Build ou dataset partagé : un seul DataFrame
+    # par process, chaque rerun n'en reçoit qu'une vue (pas la copie désérialisée de st.cache_data)
+    artifacts = get_artifacts()
+    if artifacts is not None:
+        seed_sections(artifacts.version)
+        return dataset_view(artifacts.df)
+    if SHARED_DATASET:
+        return dataset_view(get_shared_data())
+    return get_cleaned_data()
+
+
+@st.cache_resource
+def get_shared_data():
+    # Fichier Arrow mappé en mémoire, commun aux sessions et aux process serveurs (DATAVIZ_SHARED_DATASET=1)
+    return load_shared_data(DATA_PATH, loader=refresh_prepared_data if INCREMENTAL_INGEST else load_prepared_data)
+
+
+@st.cache_resource(max_entries=2)
+def seed_sections(version):
+    # Données de sections du build placées une fois dans le cache partagé des sections
+    seed_section_cache(version, artifacts_for(version).sections)
+
+
+@timed
+@st.cache_resource(max_entries=2)
+def get_cube(_df, version):
+    # Agrégats opérateur x département x puissance x trimestre, une fois par version du dataset
+    artifacts = artifacts_for(version)
+    return artifacts.cube if artifacts else build_cube(_df)
+
+
+@timed
+@st.cache_resource(max_entries=2)
+def get_map_grid(_df, version):
+    # Cellules de la carte précalculées pour chaque résolution
+    artifacts = artifacts_for(version)
+    return artifacts.map_grid if artifacts else MapGrid(_df)
+
+
+@timed
+@section_data('global_kpis')
+def get_global_kpis(df):
+    # servis par le résumé calculé à l'ingestion, sans parcourir le DataFrame
+    return summary_kpis(dataset_summary(df))
+
+
+@timed
+@section_data('samples')
+def get_samples(df):
+    # Aperçu avant / après nettoyage : 5 lignes du CSV brut, lues une fois par version du dataset
+    return sample_rows(df, DATA_PATH)
+
+
+df = get_dataset()
+cube = get_cube(df, dataset_version(df))
+map_grid = get_map_grid(df, dataset_version(df))
 st.sidebar.header("Filters")
 
 display_intro()
@@ -26,14 +97,15 @@ display_intro()
 
 #------------------------------------AFFICHAGE-----------------------------------------------------------------
 st.title("Analysis of the Electric Vehicle Charging Station Network in France")
-df_filtered = display_logical_filters(df)
+filter_result = display_logical_filters(df)
 
 # --- ------------------------------KPIs GÉNÉRAUX-------------------------------------------
 st.subheader("Overall statistics for the French network")
+global_kpis = get_global_kpis(df)
 kpi_g1, kpi_g2, kpi_g3 = st.columns(3)
-kpi_g1.metric("Total number of terminals", f"{len(df):,}")
-kpi_g2.metric("Total load points", f"{int(df['nbre_pdc'].sum()):,}")
-kpi_g3.metric("Average power (kW)", f"{df['puissance_nominale'].mean():.2f}")
+kpi_g1.metric("Total number of terminals", f"{global_kpis['count']:,}")
+kpi_g2.metric("Total load points", f"{global_kpis['pdc']:,}")
+kpi_g3.metric("Average power (kW)", f"{global_kpis['power_mean']:.2f}")
 
 
 
@@ -72,8 +144,7 @@ with tab_prep:
         "missing values and need for enrichment."
     )
     
-    df_raw_sample = load_data(path="data/station_electrique.csv").head()
-    df_clean_sample = df.head()
+    df_raw_sample, df_clean_sample = get_samples(df)
 
     # ------------------ BEFORE/AFTER------------------------
     st.subheader("Overview: Before vs. After cleaning")
@@ -91,19 +162,19 @@ with tab_prep:
     
 #--------------------------------ONGLET CARTE-------------------------------------------------------
 with tab_carte:
-    display_overview_tab(df_filtered)
+    display_overview_tab(df, filter_result, map_grid)
 
 #--------------------------------ONGLET ANALYSE TEMPORELLE6--------------------------------------------------------
 with tab_temporel:
     st.info("These three graphs tell a powerful story: that of a revolution in progress. Not only has the rollout of charging stations accelerated exponentially since 2020, but the very nature of the network has been transformed, evolving from a “slow” local infrastructure to an increasingly powerful network, tailored for the future.""")
-    evolution_nb_bornes(df)
+    evolution_nb_bornes(cube)
     
 
 #------------------------------ONGLET ANALYSE DES OPERATEURS -----------------------------------------------
 with tab_market:
     st.info("""This tab provides an overview of the forces dominating the French charging market. In two stages, I first identify the 10 largest operators in the country, then delve into their strategic DNA to understand how they have built their leadership. The analysis reveals an already structured market, led by players with very different visions.""")
-    display_top_op(df)
-    camembert_op(df)
+    display_top_op(cube)
+    camembert_op(cube)
     st.write("""This graph reveals a significant concentration of power in the French charging market. Far from being a fragmented ecosystem, the network is in fact dominated by a handful of major players. The ten largest operators are not just leaders; they collectively account for more than half of all charging stations, demonstrating an already structured and mature market where a few “giants” dictate the pace.""")
     
 
@@ -111,7 +182,7 @@ with tab_market:
 #------------------------------ONGLET COMPARATEUR--------------------------
 with tab_comparateur:
     st.info(""" This tab is an investigative tool that allows you to dissect and compare the strategies of market players. By selecting Tesla, Bouygues E&S, and TotalEnergies, we witness a veritable “clash of the titans,” illustrating three radically opposed visions of electric mobility: the high-tech pioneer, the regional integrator, and the energy giant undergoing radical change. """)
-    display_operator_comparator_tab(df, categorize_power)
+    display_operator_comparator_tab(cube)
     st.write(""" A comparison of the strategies of Tesla, Bouygues E&S, and TotalEnergies reveals three distinct visions of electric mobility that coexist in the French market. 
              Tesla embodies the technological pioneer, which, buoyed by its early and continuous growth, has built a proprietary ecosystem consisting almost exclusively of ultra-fast Superchargers designed for long journeys.
               In contrast, Bouygues E&S positions itself as the local builder, whose growth through “major projects” has resulted in a huge network of slow and fast charging stations designed to cover the country for everyday use. Finally, TotalEnergies illustrates the giant in transition: its recent massive acceleration in high-power charging reflects its hybrid strategy, which consists of transforming its historic network of gas stations to cover all market segments. This analysis shows that there is not one, but several charging markets, where user choice is dictated by usage: the speed of a Supercharger for a long trip, the availability of a local charging station for overnight charging, or the convenience of a station on the way to vacation.""")
@@ -120,16 +191,17 @@ with tab_comparateur:
 #-------------------------------ONGLET ANALYSE SPATIABLE -------------------------------------
 with tab_geo:
     st.info("""This tab tells the story of the territorial development of the charging network in three acts. The first act provides a national overview: a map of France that reveals a clear divide between well-equipped areas and “charging deserts.” The second act puts this observation into figures by ranking the leading departments. Finally, the third act provides the tools for a local survey, enabling users to discover who the dominant players are, department by department.""")
-    display_carte_by_depart(df)
+    display_carte_by_depart(cube)
     st.write("""
 This map shows the overall situation and regional inequalities. It is immediately apparent that infrastructure is heavily concentrated in the departments of large urban areas such as Paris and its suburbs, Lyon, and Marseille, as well as along major transport routes. This “red” France of metropolitan areas contrasts sharply with a large “empty diagonal” of recharge, stretching from the northeast to the southwest, which appears in blue. 
 These territories, often the most rural, are clearly under-equipped, which is a major obstacle to the adoption of electric vehicles and creates a risk of social and territorial divide.""")
     st.write("---")    
-    display_top_departements_chart(df)
+    display_top_departements_chart(cube)
     st.write(""" This bar chart puts names and figures to the leaders in deployment revealed by the map. It provides quantitative evidence of the concentration of infrastructure and allows for an unambiguous ranking of the most advanced territories. The ranking confirms the overwhelming dominance of Paris, which occupies the top spot on the podium. The rest of the top 20 is a faithful reflection of France's major urban areas, including the departments of cities such as Lyon, Marseille, and Bordeaux. The message is therefore clear: terminals are mainly located where the population and economic activity are most dense.""")
     st.write("""---""")
-    display_top_operators_by_department_chart(df)
+    display_top_operators_by_department_chart(cube)
     st.write(""" This final tool transforms the user into an analyst. By selecting a department, they can discover the local competitive landscape and answer the question 'who dominates where?'""")
 
 st.write("---")
-display_conclusion_tab()
\ No newline at end of file
+display_conclusion_tab()
+display_perf_panel({'filter_results': get_filter_cache(), 'sections': get_section_cache()})
\ No newline at end of file
@@ -0,0 +1,270 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+WORKDIR = "benchmarks/data"
+RESULTS_DIR = "benchmarks/results"
+BASELINE_PATH = "benchmarks/loadtest_baseline.json"
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+# Nombres de sessions simultanées testés et reruns scriptés par session
+SESSION_COUNTS = [1, 2, 4, 8]
+SESSION_STEPS = 10
+# Délai maximal d'un rerun (le premier prépare le dataset)
+RUN_TIMEOUT = 900
+# Écart de p95 toléré par rapport à la référence (+25 %), ignoré sous MIN_COMPARED_SECONDS
+REGRESSION_THRESHOLD = 0.25
+MIN_COMPARED_SECONDS = 0.05
+# Période d'échantillonnage de la mémoire du process (secondes)
+RSS_SAMPLE_SECONDS = 0.05
+
+
+def rss_bytes():
+    # Mémoire résidente du process (Linux), sinon le pic depuis le démarrage
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    # Pic de mémoire résidente pendant un palier de charge
+
+    def __init__(self):
+        self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+@contextmanager
+def shared_runtime():
+    # AppTest remplace le Runtime global à chaque run (puis le remet à None) et recompile app.py :
+    # des sessions simultanées se retirent le Runtime entre elles, et ast.parse n'est pas sûr entre
+    # threads en CPython 3.11. Comme sur un nœud serveur, un seul Runtime et un seul ScriptCache
+    # (protégé par son verrou) servent toutes les sessions.
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    script_cache = ScriptCache()
+    # AppTest affecte le Runtime de chaque run à cette sous-classe, sans toucher au singleton partagé
+    session_runtime = type('SessionRuntime', (Runtime,), {})
+    with patch.object(Runtime, '_instance', runtime), \
+            patch.object(app_test, 'Runtime', session_runtime), \
+            patch.object(app_test, 'ScriptCache', lambda: script_cache):
+        yield
+
+
+def _widget(at, kind, label):
+    for widget in getattr(at, kind):
+        if widget.label == label:
+            return widget
+    raise LookupError(f"no {kind} labelled {label!r}")
+
+
+def _range(rng, slider):
+    low, high = sorted(rng.sample(range(int(slider.min), int(slider.max) + 1), 2))
+    return low, high
+
+
+# Actions d'un utilisateur : filtres de la sidebar (display_logical_filters), tri du tableau détaillé,
+# département de l'onglet territorial, opérateurs du comparateur. st.tabs exécute tous les onglets
+# à chaque rerun : chaque action rend la page entière, comme l'ouverture de n'importe quel onglet.
+ACTIONS = {
+    'operator': lambda at, rng: _widget(at.sidebar, 'selectbox', "Operator :").select(
+        rng.choice(_widget(at.sidebar, 'selectbox', "Operator :").options[:30])),
+    'power': lambda at, rng: _widget(at.sidebar, 'slider', "Power range (kW):").set_value(
+        _range(rng, _widget(at.sidebar, 'slider', "Power range (kW):"))),
+    'pdc': lambda at, rng: _widget(at.sidebar, 'slider', "Number of charging points:").set_value(
+        _range(rng, _widget(at.sidebar, 'slider', "Number of charging points:"))),
+    'access': lambda at, rng: _widget(at.sidebar, 'selectbox', "Conditions of access:").select(
+        rng.choice(_widget(at.sidebar, 'selectbox', "Conditions of access:").options)),
+    'plug': lambda at, rng: _widget(at.sidebar, 'selectbox', "Plug type:").select(
+        rng.choice(_widget(at.sidebar, 'selectbox', "Plug type:").options)),
+    'payment': lambda at, rng: _widget(at.sidebar, 'multiselect', "Accepted payment methods:").set_value(
+        rng.sample(_widget(at.sidebar, 'multiselect', "Accepted payment methods:").options, rng.randint(0, 2))),
+    'sort': lambda at, rng: _widget(at, 'selectbox', "Sort by:").select(
+        rng.choice(_widget(at, 'selectbox', "Sort by:").options)),
+    'department': lambda at, rng: _widget(at, 'selectbox', "Select a department:").select(
+        rng.choice(_widget(at, 'selectbox', "Select a department:").options)),
+    'comparator': lambda at, rng: _widget(at, 'multiselect', "Choose:").set_value(
+        rng.sample(_widget(at, 'multiselect', "Choose:").options[:30], rng.randint(1, 3))),
+}
+
+
+def run_session(seed, steps=SESSION_STEPS):
+    # Une session : ouverture de la page puis `steps` actions tirées au hasard, chaque rerun chronométré
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT)
+    timings, errors = [], []
+
+    def rerun(name, func):
+        start = time.perf_counter()
+        try:
+            func().run()
+        except Exception as e:
+            # widget absent de la page rendue, délai dépassé... : compté comme une erreur de la session
+            errors.append(f"{name}: {e!r}")
+            return
+        timings.append((name, time.perf_counter() - start))
+        errors.extend(f"{name}: {e.message}" for e in at.exception)
+
+    rerun('open', lambda: at)
+    for _ in range(steps):
+        if errors:
+            break
+        name = rng.choice(list(ACTIONS))
+        rerun(name, lambda: ACTIONS[name](at, rng))
+    return timings, errors
+
+
+def run_level(n_sessions, steps=SESSION_STEPS, seed=0):
+    # n sessions simultanées dans ce process, qui partagent caches et index comme sur un nœud serveur
+    baseline_rss = rss_bytes()
+    start = time.perf_counter()
+    with RssSampler() as sampler, ThreadPoolExecutor(max_workers=n_sessions) as pool:
+        sessions = list(pool.map(lambda i: run_session(seed * 1000 + i, steps), range(n_sessions)))
+    wall = time.perf_counter() - start
+    timings = [t for session, _ in sessions for t in session]
+    errors = [e for _, session_errors in sessions for e in session_errors]
+    seconds = np.array([t for _, t in timings])
+    by_action = {}
+    for name, t in timings:
+        by_action.setdefault(name, []).append(t)
+    return {
+        'sessions': n_sessions,
+        'reruns': len(timings),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'p50': float(np.percentile(seconds, 50)),
+        'p95': float(np.percentile(seconds, 95)),
+        'p99': float(np.percentile(seconds, 99)),
+        'wall_seconds': wall,
+        'throughput': len(timings) / wall,
+        'rss_peak_mib': sampler.peak / 2**20,
+        'rss_per_session_mib': max(sampler.peak - baseline_rss, 0) / n_sessions / 2**20,
+        'p50_by_action': {name: float(np.median(values)) for name, values in sorted(by_action.items())},
+    }
+
+
+def compare(levels, baseline, threshold=REGRESSION_THRESHOLD):
+    # Paliers dont le p95 dépasse celui de la référence au-delà du seuil
+    reference = {level['sessions']: level for level in baseline.get('levels', [])}
+    regressions = []
+    for level in levels:
+        before = reference.get(level['sessions'])
+        if not before or before['p95'] < MIN_COMPARED_SECONDS:
+            continue
+        ratio = level['p95'] / before['p95']
+        if ratio > 1 + threshold:
+            regressions.append((level['sessions'], before['p95'], level['p95'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the dashboard on synthetic data")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sessions', type=int, nargs='+', default=SESSION_COUNTS)
+    parser.add_argument('--steps', type=int, default=SESSION_STEPS)
+    parser.add_argument('--workdir', default=WORKDIR)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--save-baseline', action='store_true', help="record these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    # posés avant le premier import de l'app : utils.io lit DATAVIZ_CSV et utils.artifacts DATAVIZ_BUILD_DIR
+    # à l'import. Build vide : un build de production présent dans data/build n'est jamais mesuré à la place
+    # des données synthétiques.
+    os.environ['DATAVIZ_CSV'] = os.path.abspath(os.path.join(args.workdir, f"synthetic-{args.rows}-{args.seed}.csv"))
+    empty_build = tempfile.TemporaryDirectory(prefix="loadtest-build-")
+    os.environ['DATAVIZ_BUILD_DIR'] = empty_build.name
+    os.environ.setdefault('DATAVIZ_PAYLOAD_STRICT', '1')
+    from benchmarks.synthetic import dataset_path
+    # avertissements de Streamlit (dépréciations, contexte absent des threads de session) répétés à chaque rerun
+    logging.disable(logging.WARNING)
+    dataset_path(args.workdir, args.rows, args.seed)
+
+    with shared_runtime():
+        # session de chauffe : préparation du dataset, index et caches partagés
+        start = time.perf_counter()
+        _, errors = run_session(args.seed, steps=0)
+        cold_start = time.perf_counter() - start
+        print(f"cold start {cold_start:.2f} s" + (f" ERROR {errors[0]}" if errors else ""), flush=True)
+
+        levels = []
+        for n_sessions in args.sessions:
+            level = run_level(n_sessions, args.steps, args.seed)
+            levels.append(level)
+            print(f"{n_sessions:>3} sessions  p50 {level['p50']:.3f} s  p95 {level['p95']:.3f} s  p99 {level['p99']:.3f} s  "
+                  f"{level['throughput']:.2f} reruns/s  RSS {level['rss_peak_mib']:.0f} MiB "
+                  f"({level['rss_per_session_mib']:.1f} MiB/session)"
+                  + (f"  {level['errors']} errors: {level['first_error']}" if level['errors'] else ""), flush=True)
+
+    report = {
+        'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+        'rows': args.rows, 'seed': args.seed, 'steps': args.steps, 'cold_start_seconds': cold_start, 'levels': levels,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    empty_build.cleanup()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    elif not args.save_baseline:
+        # comme benchmarks.run : sans référence, le contrôle échoue au lieu de passer en silence
+        print(f"NO BASELINE at {args.baseline}: run with --save-baseline to record one", flush=True)
+    regressions = compare(levels, baseline, args.threshold)
+    for n_sessions, before, after, ratio in regressions:
+        print(f"REGRESSION {n_sessions} sessions p95: {before:.3f} s -> {after:.3f} s (x{ratio:.2f})")
+    failed = any(level['errors'] for level in levels)
+    missing_baseline = not baseline and not args.save_baseline
+    return 1 if regressions or failed or missing_baseline else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from benchmarks.synthetic import BENCH_SIZES, dataset_path
+from utils.io import load_data
+from utils.cache import build_prepared_data
+from utils.filter_index import FilterIndex, PRISE_MAPPING, PAIEMENT_MAPPING
+from utils.filters import compute_kpis
+from utils.query import QueryEngine
+from utils.cube import (
+    build_cube, operator_counts, operator_power_profile, market_shares, counts_by_departement,
+    top_operators_in_departement, quarterly_installations, quarterly_by_power, operator_growth,
+)
+from utils.map_grid import MapGrid
+
+WORKDIR = "benchmarks/data"
+RESULTS_DIR = "benchmarks/results"
+BASELINE_PATH = "benchmarks/baseline.json"
+# Écart toléré par rapport à la référence avant de déclarer une régression (+25 %)
+REGRESSION_THRESHOLD = 0.25
+# En dessous de cette durée, l'écart relatif n'est que du bruit de mesure (secondes)
+MIN_COMPARED_SECONDS = 0.005
+
+
+def measure(func, repeat=1, memory=True):
+    # Meilleur temps sur `repeat` exécutions, puis une exécution sous tracemalloc pour le pic mémoire
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, {'seconds': best, 'peak_bytes': peak}
+
+
+def filter_selections(df):
+    # Combinaisons représentatives de la barre latérale : aucun filtre, un opérateur, plusieurs filtres
+    top_operator = df['nom_operateur'].value_counts().index[0]
+    return {
+        'all': {},
+        'operator': {'operateur': top_operator},
+        'combined': {
+            'operateur': top_operator,
+            'acces': 'Accès libre',
+            'prise': PRISE_MAPPING['Combo CCS'],
+            'paiements': (PAIEMENT_MAPPING['Payment by credit card'],),
+            'puissance': (50, 350),
+            'pdc': (1, 10),
+        },
+    }
+
+
+def run_benchmarks(n_rows, seed=0, workdir=WORKDIR, memory=True, repeat=3):
+    results = {}
+
+    def stage(name, func, repeat=1):
+        value, results[name] = measure(func, repeat=repeat, memory=memory)
+        print(f"{name:<46} {results[name]['seconds']:>9.4f} s"
+              + (f" {results[name]['peak_bytes'] / 2**20:>10.1f} MiB" if memory else ""), flush=True)
+        return value
+
+    csv_path = dataset_path(workdir, n_rows, seed)
+
+    # ----- ingestion et préparation
+    stage('ingest.load_data', lambda: load_data(csv_path))
+    df = stage('prep.build_prepared_data', lambda: build_prepared_data(csv_path))
+
+    # ----- filtres (ce que fait display_logical_filters, sans les widgets)
+    index = stage('filters.build_index', lambda: FilterIndex(df))
+    for name, selection in filter_selections(df).items():
+        stage(f'filters.resolve.{name}', lambda: compute_kpis(df, index.resolve(**selection)), repeat=repeat)
+    stage('filters.search', lambda: index.search('avenue'), repeat=repeat)
+    stage('filters.sort', lambda: index.sort(np.arange(len(df)), 'puissance_nominale', True), repeat=repeat)
+    # balayage opérateur x prise x paiement en un lot (utils.query)
+    engine = QueryEngine(df, index)
+    operators = list(df['nom_operateur'].value_counts().index[:50])
+    stage('query.sweep', lambda: engine.sweep(
+        operateur=operators, prise=list(PRISE_MAPPING), paiements=[[label] for label in PAIEMENT_MAPPING],
+    ), repeat=repeat)
+
+    # ----- agrégats des graphiques
+    cube = stage('charts.build_cube', lambda: build_cube(df))
+    top_operators = list(operator_counts(cube).index[:3].astype(str))
+    departement = counts_by_departement(cube)['departement'].iloc[0]
+    charts = {
+        'time_series.quarterly_installations': lambda: quarterly_installations(cube),
+        'time_series.quarterly_by_power': lambda: quarterly_by_power(cube),
+        'market.top_operators_profile': lambda: operator_power_profile(cube, operator_counts(cube).index[:10]),
+        'market.market_shares': lambda: market_shares(cube, 10),
+        'spatial.departement_counts': lambda: counts_by_departement(cube),
+        'spatial.top_operators_in_departement': lambda: top_operators_in_departement(cube, departement, 5),
+        'comparator.power_profile': lambda: operator_power_profile(cube, top_operators),
+        'comparator.growth': lambda: operator_growth(cube, top_operators),
+    }
+    for name, func in charts.items():
+        stage(f'charts.{name}', func, repeat=repeat)
+
+    # ----- carte
+    grid = stage('map.build_grid', lambda: MapGrid(df))
+    positions = np.arange(len(df))
+    stage('map.aggregate', lambda: grid.aggregate(positions, grid.auto_resolution(positions)), repeat=repeat)
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    # Étapes plus lentes que la référence au-delà du seuil (les étapes très courtes sont ignorées)
+    regressions = []
+    for name, measured in results.items():
+        reference = baseline.get(name)
+        if not reference or reference['seconds'] < MIN_COMPARED_SECONDS:
+            continue
+        ratio = measured['seconds'] / reference['seconds']
+        if ratio > 1 + threshold:
+            regressions.append((name, reference['seconds'], measured['seconds'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingest, preparation, filtering and chart aggregations")
+    parser.add_argument('--rows', type=int, nargs='+', default=BENCH_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=WORKDIR)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--save-baseline', action='store_true', help="record these results as the new baseline")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    elif not args.save_baseline:
+        # sans référence, aucune comparaison possible : le contrôle échoue au lieu de passer en silence
+        print(f"NO BASELINE at {args.baseline}: run with --save-baseline to record one", flush=True)
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'sizes': {}}
+    regressions, missing = [], []
+    for n_rows in args.rows:
+        print(f"--- {n_rows:,} rows")
+        results = run_benchmarks(n_rows, seed=args.seed, workdir=args.workdir, memory=not args.no_memory)
+        report['sizes'][str(n_rows)] = results
+        reference = baseline.get('sizes', {}).get(str(n_rows))
+        if reference is None:
+            # taille absente de la référence : rien à comparer, le contrôle échoue aussi
+            missing.append(n_rows)
+            continue
+        regressions += [(n_rows,) + r for r in compare(results, reference, args.threshold)]
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        # les tailles non mesurées dans ce run gardent leur référence
+        saved = dict(report, sizes=dict(baseline.get('sizes', {}), **report['sizes']))
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, indent=2)
+
+    for n_rows, name, before, after, ratio in regressions:
+        print(f"REGRESSION {n_rows:,} rows {name}: {before:.4f} s -> {after:.4f} s (x{ratio:.2f})")
+    if baseline and not args.save_baseline:
+        for n_rows in missing:
+            print(f"NO BASELINE for {n_rows:,} rows in {args.baseline}: run with --save-baseline to record one")
+    missing_baseline = bool(missing) and not args.save_baseline
+    return 1 if regressions or missing_baseline else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
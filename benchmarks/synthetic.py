@@ -0,0 +1,131 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import shapely
+from utils.geo import get_geometry_store
+
+# Tailles de référence du banc d'essai
+BENCH_SIZES = [100_000, 1_000_000, 10_000_000]
+# Lignes écrites par bloc : la génération de 10M de lignes ne tient jamais tout en mémoire
+WRITE_ROWS = 500_000
+
+# Opérateurs sous leurs variantes brutes, du plus gros au plus petit (poids en loi de Zipf)
+OPERATORS = [
+    'BOUYGUES ENERGIES & SERVICES', 'TotalEnergies Charging Services', 'FRESHMILE SAS', 'IZIVIA',
+    'Tesla France SARL', 'Power Dot', 'LIDL FRANCE', 'Electra', 'IONITY', 'Allego', 'Driveco',
+    'TOTALENERGIES MARKETING FRANCE', 'EVBOX', 'Shell Recharge', 'Fastned', 'Zunder (Grupo Easycharger S.A)',
+    'Bouygues Energies et Services', 'CHARGE POINT', 'Atlante France', 'WAAT SAS', 'SPIE CityNetworks',
+    'ALDI MARCHE COLMAR', 'Virta', 'BP PULSE', 'Morbihan Énergies', 'MOVIVE_IZIVIA', 'Freshmile | Roaming',
+    'Non concerné', 'Pas ditinerance',
+] + [f'Régie locale {i}' for i in range(1, 400)]
+
+# Grandes agglomérations (lon, lat) : la majorité des stations s'y concentrent
+CITIES = [
+    (2.35, 48.86), (4.84, 45.76), (5.37, 43.30), (1.44, 43.60), (7.27, 43.70), (-1.55, 47.22),
+    (7.75, 48.58), (3.88, 43.61), (-0.58, 44.84), (3.06, 50.63), (-1.68, 48.11), (4.03, 49.26),
+    (0.11, 49.49), (5.72, 45.19), (5.04, 47.32), (-0.55, 47.47), (1.91, 47.90), (6.18, 48.69),
+]
+
+POWER_VALUES = ['3.7', '7.4', '11', '22', '24', '50', '100', '150', '175', '300', '350', '22000', 'abc', '']
+POWER_WEIGHTS = [.02, .15, .12, .33, .03, .09, .04, .07, .03, .06, .04, .005, .005, .01]
+FLAG_VALUES = ['true', 'false', 'True', 'False', '1', '0', '']
+FLAG_COLUMNS = [
+    'prise_type_ef', 'prise_type_2', 'prise_type_combo_ccs', 'prise_type_chademo', 'prise_type_autre',
+    'paiement_acte', 'paiement_cb', 'paiement_autre',
+]
+
+
+def operator_weights(n_operators, exponent=1.1):
+    weights = 1 / np.arange(1, n_operators + 1) ** exponent
+    return weights / weights.sum()
+
+
+def station_coordinates(n_stations, rng, city_share=0.6):
+    # Coordonnées à l'intérieur des départements (tirage avec rejet sur les contours fournis) :
+    # une part autour des grandes villes, le reste uniformément sur le territoire
+    store = get_geometry_store()
+    france = shapely.union_all(store.geometries)
+    shapely.prepare(france)
+    minx, miny, maxx, maxy = shapely.total_bounds(store.geometries)
+    centers = np.array(CITIES)
+
+    lon, lat = np.empty(0), np.empty(0)
+    while len(lon) < n_stations:
+        batch = 2 * (n_stations - len(lon)) + 1_000
+        near_city = rng.random(batch) < city_share
+        city = centers[rng.integers(0, len(centers), batch)]
+        x = np.where(near_city, city[:, 0] + rng.normal(0, 0.25, batch), rng.uniform(minx, maxx, batch))
+        y = np.where(near_city, city[:, 1] + rng.normal(0, 0.18, batch), rng.uniform(miny, maxy, batch))
+        inside = shapely.contains_xy(france, x, y)
+        lon, lat = np.concatenate([lon, x[inside]]), np.concatenate([lat, y[inside]])
+    return lon[:n_stations].round(6), lat[:n_stations].round(6)
+
+
+def service_dates(n_rows, rng):
+    # Déploiement qui s'accélère : dates concentrées sur les dernières années, 10 % non renseignées
+    start = np.datetime64('2012-01-01')
+    days = (rng.beta(4, 1.5, n_rows) * 365 * 13).astype('int64')
+    dates = (start + days.astype('timedelta64[D]')).astype(str).astype(object)
+    dates[rng.random(n_rows) < 0.10] = ''
+    dates[rng.random(n_rows) < 0.002] = 'n/a'
+    return dates
+
+
+def generate_csv(path, n_rows, seed=0):
+    # CSV au format du fichier consolidé IRVE : ~3 points de charge par station, opérateurs très
+    # concentrés, puissances et dates réalistes, quelques valeurs invalides et coordonnées manquantes
+    rng = np.random.default_rng(seed)
+    n_stations = max(n_rows // 3, 1)
+    station_lon, station_lat = station_coordinates(n_stations, rng)
+    station_operator = rng.choice(len(OPERATORS), n_stations, p=operator_weights(len(OPERATORS)))
+    station_access = rng.choice(['Accès libre', 'Accès réservé'], n_stations, p=[.85, .15])
+    operators = np.array(OPERATORS, dtype=object)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    for start in range(0, n_rows, WRITE_ROWS):
+        size = min(WRITE_ROWS, n_rows - start)
+        station = rng.integers(0, n_stations, size)
+        lon = station_lon[station].astype(object)
+        lat = station_lat[station].astype(object)
+        missing = rng.random(size) < 0.02
+        lon[missing], lat[missing] = '', ''
+        operator = operators[station_operator[station]]
+        operator[rng.random(size) < 0.03] = ''
+
+        chunk = pd.DataFrame({
+            'nom_amenageur': 'AMENAGEUR',
+            'id_pdc_itinerance': [f'FRX{i:09d}' for i in range(start, start + size)],
+            'nom_operateur': operator,
+            'adresse_station': [f'{s} avenue de la Recharge' for s in station],
+            'consolidated_longitude': lon,
+            'consolidated_latitude': lat,
+            'puissance_nominale': rng.choice(POWER_VALUES, size, p=POWER_WEIGHTS),
+            **{col: rng.choice(FLAG_VALUES, size) for col in FLAG_COLUMNS},
+            'condition_acces': station_access[station],
+            'reservation': rng.choice(['true', 'false', ''], size),
+            'date_mise_en_service': service_dates(size, rng),
+            'nbre_pdc': rng.choice([1, 2, 2, 2, 4, 4, 6, 8, 10, 20], size),
+            'observations': '',
+        })
+        chunk.to_csv(tmp_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def dataset_path(workdir, n_rows, seed=0):
+    # Fichier généré réutilisé tant que la taille et la graine sont les mêmes
+    path = os.path.join(workdir, f"synthetic-{n_rows}-{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(workdir, exist_ok=True)
+        generate_csv(path, n_rows, seed)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic charging-station CSV")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate_csv(args.path, args.rows, args.seed)
@@ -0,0 +1,25 @@
+import os
+import pytest
+from utils.io import GEOJSON_PATH
+from benchmarks.synthetic import dataset_path
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='session')
+def workdir(tmp_path_factory):
+    # Répertoire de travail isolé : les chemins relatifs de l'app (data/cache, data/build, table des
+    # opérateurs) n'y touchent pas ceux du dépôt ; seuls les contours GeoJSON y sont liés
+    path = tmp_path_factory.mktemp('repo')
+    os.makedirs(path / os.path.dirname(GEOJSON_PATH))
+    os.symlink(os.path.join(REPO_DIR, GEOJSON_PATH), path / GEOJSON_PATH)
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(previous)
+
+
+@pytest.fixture(scope='session')
+def synthetic_csv(workdir):
+    # Petits fichiers du générateur des benchmarks, un par graine
+    return lambda n_rows=20_000, seed=0: os.path.abspath(dataset_path("synthetic", n_rows, seed))
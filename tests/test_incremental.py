@@ -0,0 +1,28 @@
+import pandas as pd
+from utils.cache import build_prepared_data
+from utils.incremental import KEY_COLUMN, refresh_prepared_data
+
+
+def test_refresh_matches_full_build(synthetic_csv, tmp_path):
+    csv_path = synthetic_csv(20_000, seed=2)
+    raw = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    refresh_prepared_data(csv_path, state_dir=tmp_path / 'state')
+
+    # nouvelle version : lignes valides déplacées hors de France (désormais rejetées), puissances
+    # modifiées, lignes supprimées et lignes ajoutées
+    edited = raw.copy()
+    edited.loc[0:199, ['consolidated_longitude', 'consolidated_latitude']] = '0'
+    edited.loc[200:399, 'puissance_nominale'] = '43'
+    edited = edited.drop(index=range(400, 600))
+    added = raw.iloc[600:800].copy()
+    added[KEY_COLUMN] = added[KEY_COLUMN] + '-new'
+    edited = pd.concat([edited, added])
+    edited_path = tmp_path / 'edited.csv'
+    edited.to_csv(edited_path, index=False)
+
+    refreshed = refresh_prepared_data(str(edited_path), state_dir=tmp_path / 'state')
+    full = build_prepared_data(str(edited_path))
+    assert refreshed.attrs['ingest_report'] == {'inserted': 200, 'updated': 400, 'unchanged': 19_400, 'deleted': 200}
+    assert len(refreshed) == len(full)
+    pd.testing.assert_frame_equal(refreshed.reset_index(drop=True), full.reset_index(drop=True), check_like=True)
+    assert refreshed.attrs['validation_report'] == full.attrs['validation_report']
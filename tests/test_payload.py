@@ -0,0 +1,57 @@
+import altair as alt
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+import utils.payload as payload
+from utils.cache import build_prepared_data
+from utils.cube import build_cube
+
+
+def render_charts(cube_path):
+    # Tous les graphiques Altair de utils.viz (display_chart), rendus dans une vraie exécution Streamlit
+    import pandas as pd
+    from utils import viz
+    cube = pd.read_pickle(cube_path)
+    viz.display_top_op(cube)
+    viz.camembert_op(cube)
+    viz.display_top_departements_chart(cube)
+    viz.display_top_operators_by_department_chart(cube)
+    viz.display_operator_comparator_tab(cube)
+
+
+@pytest.fixture
+def strict(monkeypatch):
+    # équivalent de DATAVIZ_PAYLOAD_STRICT=1, lu à l'import du module ; chaque taille mesurée est gardée
+    monkeypatch.setattr(payload, 'PAYLOAD_STRICT', True)
+    sizes = []
+    compact_chart = payload.compact_chart
+
+    def recording(chart):
+        chart, size = compact_chart(chart)
+        sizes.append(size)
+        return chart, size
+
+    monkeypatch.setattr(payload, 'compact_chart', recording)
+    return sizes
+
+
+def test_viz_charts_stay_under_budget(strict, synthetic_csv, tmp_path):
+    cube_path = tmp_path / "cube.pkl"
+    build_cube(build_prepared_data(synthetic_csv())).to_pickle(cube_path)
+    at = AppTest.from_function(render_charts, args=(str(cube_path),), default_timeout=120).run()
+    assert not at.exception, [e.message for e in at.exception]
+    # top 10, parts de marché, départements, comparateur (parc par puissance + croissance)
+    assert len(strict) == 5
+
+    departement = next(s for s in at.selectbox if s.label == "Select a department:")
+    departement.select(departement.options[0]).run()
+    assert not at.exception, [e.message for e in at.exception]
+    # + top 5 des opérateurs du département choisi
+    assert len(strict) == 11
+    assert max(strict) <= payload.CHART_PAYLOAD_BUDGET
+
+
+def test_over_budget_chart_fails_in_strict_mode(strict):
+    chart = alt.Chart(pd.DataFrame({'x': range(10_000), 'y': range(10_000)})).mark_point().encode(x='x:Q', y='y:Q')
+    with pytest.raises(payload.PayloadBudgetExceeded):
+        payload.display_chart(chart, budget=1024)
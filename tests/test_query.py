@@ -0,0 +1,23 @@
+from utils.artifacts import get_artifacts
+from utils.build import build_artifacts
+from utils.cache import dataset_fingerprint, load_prepared_data
+from utils.query import QueryEngine
+
+
+def test_from_dataset_serves_the_requested_csv(synthetic_csv):
+    built_csv, other_csv = synthetic_csv(20_000, seed=0), synthetic_csv(5_000, seed=1)
+    build_artifacts(built_csv)
+    get_artifacts.cache_clear()
+    artifacts = get_artifacts()
+    assert artifacts.version == dataset_fingerprint(built_csv)
+
+    # CSV du build : dataset et index mappés
+    engine = QueryEngine.from_dataset(built_csv)
+    assert engine.index is artifacts.filter_index
+
+    # autre CSV : le build est ignoré, le dataset servi est celui demandé
+    engine = QueryEngine.from_dataset(other_csv)
+    expected = load_prepared_data(other_csv)
+    assert engine.df.attrs['dataset_version'] == dataset_fingerprint(other_csv) != artifacts.version
+    assert len(engine.df) == len(expected)
+    assert engine.run([{}])['count'].iloc[0] == len(expected)
@@ -0,0 +1,113 @@
+import hashlib
+import importlib.util
+import json
+import mmap
+import os
+import pickle
+from functools import lru_cache
+import utils.filter_index
+import utils.map_grid
+import utils.cube
+import utils.shared
+from utils.io import DATA_PATH, GEOJSON_PATH
+from utils.cache import PREP_MODULES, code_fingerprint, dataset_fingerprint
+from utils.shared import read_arrow
+
+# Artefacts produits hors Streamlit par `python -m utils.build`, lus au démarrage de l'app
+BUILD_DIR = os.environ.get('DATAVIZ_BUILD_DIR', "data/build")
+MANIFEST_FILE = "manifest.json"
+# Modules dont dépendent les artefacts (données préparées, index, cube, grille, écriture du build ;
+# utils.build par son nom : il importe celui-ci)...
+ARTIFACT_MODULES = PREP_MODULES + [utils.filter_index, utils.map_grid, utils.cube, utils.shared, 'utils.build']
+# ... et les données de sections précalculées (modules désignés par leur nom : ils importent celui-ci)
+SECTION_MODULES = ['utils.viz', 'utils.filters', 'utils.cube']
+# Alignement des tableaux dans les fichiers .bin mappés en mémoire (octets)
+BUFFER_ALIGN = 64
+
+
+def section_fingerprint():
+    h = hashlib.blake2b(digest_size=16)
+    for name in SECTION_MODULES:
+        with open(importlib.util.find_spec(name).origin, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def dump_mapped(obj, path):
+    # Pickle protocole 5 : les tableaux numpy sortent hors bande dans `path.bin`, alignés,
+    # et le reste de l'objet (petit) va dans `path.pkl`
+    buffers = []
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    offsets = []
+    with open(f"{path}.bin", 'wb') as f:
+        for buffer in buffers:
+            data = buffer.raw()
+            f.write(b'\0' * (-f.tell() % BUFFER_ALIGN))
+            offsets.append((f.tell(), data.nbytes))
+            f.write(data)
+    with open(f"{path}.pkl", 'wb') as f:
+        pickle.dump({'offsets': offsets, 'payload': payload}, f, protocol=5)
+
+
+def load_mapped(path):
+    # Les tableaux pointent directement dans le fichier mappé (lecture seule) : rien n'est copié
+    with open(f"{path}.pkl", 'rb') as f:
+        stored = pickle.load(f)
+    buffers = []
+    if stored['offsets']:
+        with open(f"{path}.bin", 'rb') as f:
+            mapped = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        buffers = [mapped[start:start + size] for start, size in stored['offsets']]
+    return pickle.loads(stored['payload'], buffers=buffers)
+
+
+class Artifacts:
+    # Artefacts d'un build, mappés en mémoire. `sections` est vide si le code des sections a changé
+    # depuis le build (elles seront recalculées à la demande).
+
+    def __init__(self, build_dir, manifest):
+        self.build_dir = build_dir
+        self.manifest = manifest
+        self.version = manifest['dataset_version']
+        # tables Arrow mappées : index et attrs sont dans le fichier
+        self.df = read_arrow(os.path.join(build_dir, "prepared.feather"))
+        self.cube = read_arrow(os.path.join(build_dir, "cube.feather"))
+        self.filter_index = load_mapped(os.path.join(build_dir, "filter_index"))
+        self.map_grid = load_mapped(os.path.join(build_dir, "map_grid"))
+        self.sections = {}
+        if manifest['section_code'] == section_fingerprint():
+            self.sections = load_mapped(os.path.join(build_dir, "sections"))
+
+    def geojson_path(self, variant):
+        return os.path.join(self.build_dir, f"departements-{variant}.geojson")
+
+
+def read_manifest(build_dir=BUILD_DIR):
+    try:
+        with open(os.path.join(build_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_artifacts(build_dir=BUILD_DIR, csv_path=DATA_PATH):
+    # Build courant, ou None s'il n'existe pas, s'il a été produit par un autre code de préparation ou à partir
+    # d'un autre CSV que celui servi (un hash du CSV par process). Sans le CSV (seul le build est déployé),
+    # le build fait foi.
+    manifest = read_manifest(build_dir)
+    if manifest is None or manifest['artifact_code'] != code_fingerprint(ARTIFACT_MODULES):
+        return None
+    # contours : ceux du build (`--geojson`), ou ceux de l'app si le build a été déplacé sans eux
+    geojson_path = manifest['source']['geojson']
+    if not os.path.exists(geojson_path):
+        geojson_path = GEOJSON_PATH
+    if os.path.exists(csv_path) and manifest['dataset_version'] != dataset_fingerprint(csv_path, geojson_path):
+        return None
+    return Artifacts(build_dir, manifest)
+
+
+def artifacts_for(version):
+    # Artefacts du build si c'est bien cette version du dataset qui est servie
+    artifacts = get_artifacts()
+    return artifacts if artifacts is not None and artifacts.version == version else None
@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import utils.viz
+import utils.filters
+from utils.io import DATA_PATH, GEOJSON_PATH, load_data
+from utils.cache import code_fingerprint, prep_fingerprint, dataset_fingerprint, build_prepared_data
+from utils.parallel import PREP_WORKERS
+from utils.memory import unpack_flags
+from utils.filter_index import FilterIndex
+from utils.map_grid import MapGrid
+from utils.cube import build_cube
+from utils.geo import get_geometry_store, SIMPLIFY_TOLERANCES
+from utils.shared import write_arrow
+from utils.artifacts import BUILD_DIR, MANIFEST_FILE, ARTIFACT_MODULES, section_fingerprint, dump_mapped
+
+
+def sample_rows(df, csv_path=DATA_PATH):
+    # Aperçu avant / après nettoyage : 5 lignes du CSV brut et 5 lignes préparées
+    return load_data(path=csv_path, nrows=5), unpack_flags(df.head())
+
+
+def section_payloads(df, cube):
+    # Données des sections qui ne dépendent d'aucun widget (ou d'un widget à peu de valeurs),
+    # sous leur clé de section_data : (nom,) + entrées
+    viz, filters = utils.viz, utils.filters
+    payloads = {
+        ('sidebar_options',): filters.filter_options.__wrapped__(df),
+        ('preprocessing',): viz.preprocessing_data.__wrapped__(df),
+        ('time_series',): viz.time_series_data.__wrapped__(cube),
+        ('top_operators',): viz.top_operators_data.__wrapped__(cube),
+        ('market_shares',): viz.market_shares_data.__wrapped__(cube),
+        ('departement_counts',): viz.departement_counts_data.__wrapped__(cube),
+        ('departement_list',): viz.departement_list_data.__wrapped__(cube),
+        ('operator_list',): viz.operator_list_data.__wrapped__(cube),
+    }
+    for departement in payloads[('departement_list',)]:
+        payloads[('departement_top_operators', departement)] = viz.departement_top_operators_data.__wrapped__(cube, departement)
+    operators = tuple(op for op in viz.DEFAULT_COMPARED_OPERATORS if op in payloads[('operator_list',)])
+    if operators:
+        payloads[('operator_comparison', operators)] = viz.operator_comparison_data.__wrapped__(cube, operators)
+    return payloads
+
+
+def build_artifacts(csv_path=DATA_PATH, geojson_path=GEOJSON_PATH, out_dir=BUILD_DIR, workers=PREP_WORKERS):
+    timings = {}
+
+    def step(name, func):
+        start = time.perf_counter()
+        result = func()
+        timings[name] = round(time.perf_counter() - start, 3)
+        print(f"{name:<20} {timings[name]:>8.2f} s", flush=True)
+        return result
+
+    version = dataset_fingerprint(csv_path, geojson_path)
+    df = step('prepare', lambda: build_prepared_data(csv_path, geojson_path, workers=workers))
+    df.attrs['dataset_version'] = version
+    cube = step('cube', lambda: build_cube(df))
+    filter_index = step('filter_index', lambda: FilterIndex(df))
+    map_grid = step('map_grid', lambda: MapGrid(df))
+    sections = step('sections', lambda: section_payloads(df, cube))
+    sections[('samples',)] = sample_rows(df, csv_path)
+    store = step('geometry', lambda: get_geometry_store(geojson_path))
+
+    # nouveau répertoire écrit à côté, puis échangé : l'app ne lit jamais un build incomplet
+    tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    def write():
+        # Feather non compressé : relu par mapping mémoire, sans décodage
+        write_arrow(df, os.path.join(tmp_dir, "prepared.feather"))
+        write_arrow(cube, os.path.join(tmp_dir, "cube.feather"))
+        dump_mapped(filter_index, os.path.join(tmp_dir, "filter_index"))
+        dump_mapped(map_grid, os.path.join(tmp_dir, "map_grid"))
+        dump_mapped(sections, os.path.join(tmp_dir, "sections"))
+        for variant in SIMPLIFY_TOLERANCES:
+            with open(os.path.join(tmp_dir, f"departements-{variant}.geojson"), 'w', encoding='utf-8') as f:
+                json.dump(store.geojson(variant), f, separators=(',', ':'))
+    step('write', write)
+
+    files = {}
+    for name in sorted(os.listdir(tmp_dir)):
+        with open(os.path.join(tmp_dir, name), 'rb') as f:
+            files[name] = {'bytes': os.path.getsize(f.name), 'blake2b': hashlib.file_digest(f, 'blake2b').hexdigest()[:32]}
+    manifest = {
+        'dataset_version': version,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'source': {'csv': os.path.abspath(csv_path), 'geojson': os.path.abspath(geojson_path)},
+        'prep_code': prep_fingerprint(),
+        'artifact_code': code_fingerprint(ARTIFACT_MODULES),
+        'section_code': section_fingerprint(),
+        'rows': len(df),
+        'attrs': df.attrs,
+        'timings': timings,
+        'files': files,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = f"{out_dir}.{os.getpid()}.old"
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the prepared dataset and every dashboard artifact")
+    parser.add_argument('--csv', default=DATA_PATH)
+    parser.add_argument('--geojson', default=GEOJSON_PATH)
+    parser.add_argument('--out', default=BUILD_DIR)
+    parser.add_argument('--workers', type=int, default=PREP_WORKERS)
+    args = parser.parse_args(argv)
+    manifest = build_artifacts(args.csv, args.geojson, args.out, args.workers)
+    print(f"build {manifest['dataset_version']}: {manifest['rows']:,} rows, "
+          f"{sum(f['bytes'] for f in manifest['files'].values()) / 2**20:,.1f} MiB in {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import hashlib
+import importlib.util
+import os
+import glob
+import sys
+import pandas as pd
+import utils.io
+import utils.prep
+import utils.schema
+import utils.spatial
+import utils.geo
+import utils.operators
+import utils.memory
+import utils.sketch
+import utils.parallel
+import utils.validation
+from utils.io import iter_data, GEOJSON_PATH
+from utils.prep import prepare_data, colonnes_a_garder
+from utils.schema import read_dtypes, merge_reports
+from utils.memory import compact_frame, memory_report
+from utils.sketch import summarize, merge_summaries, summary_to_dict
+from utils.validation import merge_validation
+from utils.operators import save_operator_lookup
+from utils.parallel import prepare_parallel, PREP_WORKERS
+
+CACHE_DIR = "data/cache"
+
+# Modules dont le code influence le dataset préparé (prepare_data, puis fusion et compactage des blocs
+# dans ce module) : toute modification de ces fichiers invalide le cache.
+PREP_MODULES = [utils.io, utils.prep, utils.schema, utils.spatial, utils.geo, utils.operators, utils.memory, utils.sketch, utils.parallel, utils.validation, sys.modules[__name__]]
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    # Hash du contenu lu par blocs, sans charger le fichier en mémoire
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def code_fingerprint(modules=None):
+    # Modules donnés par objet, ou par nom quand ils importent l'appelant (import circulaire)
+    h = hashlib.blake2b(digest_size=16)
+    for module in modules or PREP_MODULES:
+        path = importlib.util.find_spec(module).origin if isinstance(module, str) else module.__file__
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def prep_fingerprint():
+    # Tout ce qui, hors données, change le résultat de prepare_data : son code et les alias d'opérateurs validés
+    h = hashlib.blake2b(digest_size=16)
+    h.update(code_fingerprint().encode())
+    if os.path.exists(utils.operators.ALIASES_PATH):
+        h.update(file_fingerprint(utils.operators.ALIASES_PATH).encode())
+    return h.hexdigest()
+
+
+def dataset_fingerprint(csv_path, geojson_path=GEOJSON_PATH):
+    # Version du dataset préparé = source CSV + contours GeoJSON + code de préparation
+    h = hashlib.blake2b(digest_size=8)
+    for part in (file_fingerprint(csv_path), file_fingerprint(geojson_path), prep_fingerprint()):
+        h.update(part.encode())
+    return h.hexdigest()
+
+
+def dataset_version(df):
+    return df.attrs.get('dataset_version')
+
+
+def _write_atomic(df, path):
+    # Écrit dans un fichier temporaire puis renomme : un autre process (replica, redéploiement)
+    # ne lit jamais un parquet à moitié écrit
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def remove_stale(cache_dir, version):
+    # Garde les fichiers (parquet compact ou non, Arrow partagé) de la version courante, supprime les autres
+    for path in glob.glob(os.path.join(cache_dir, "prepared-*")):
+        if version not in path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def build_prepared_data(csv_path, geojson_path=GEOJSON_PATH, compact=True, workers=PREP_WORKERS):
+    # Lecture en streaming, limitée aux colonnes utiles : seul un bloc brut est en mémoire à la fois
+    # et les colonnes non textuelles sont typées dès la lecture selon le schéma.
+    # Avec plusieurs workers, les mêmes blocs sont lus et préparés dans un pool de process (utils.parallel).
+    chunks = prepare_parallel(csv_path, geojson_path, workers) if workers > 1 else None
+    if chunks is None:
+        chunks = [
+            prepare_data(chunk, geojson_path=geojson_path)
+            for chunk in iter_data(csv_path, usecols=colonnes_a_garder, dtype=read_dtypes())
+        ]
+    df = pd.concat(chunks)
+    df.attrs = {}
+    coercion_report = merge_reports(chunk.attrs['coercion_report'] for chunk in chunks)
+    validation_report = merge_validation(chunk.attrs['validation_report'] for chunk in chunks)
+    # résumés (count/sum/min/max + t-digest) bloc par bloc, fusionnés : servis tels quels aux sliders et KPIs
+    summary = merge_summaries(summarize(chunk) for chunk in chunks)
+    save_operator_lookup(name for chunk in chunks for name in chunk.attrs['operator_names'])
+
+    if compact:
+        # categories, float32, petits entiers et drapeaux compactés sur un octet (utils.memory)
+        df_compact = compact_frame(df)
+        # octets des blocs tels que préparés : même mesure en série et en parallèle
+        bytes_before = pd.DataFrame([chunk.attrs['memory_bytes'] for chunk in chunks]).sum()
+        report = memory_report(bytes_before, df_compact)
+        df = df_compact
+        df.attrs['memory_report'] = {col: [int(row['before']), int(row['after'])] for col, row in report.iterrows()}
+
+    df.attrs['coercion_report'] = coercion_report
+    df.attrs['validation_report'] = validation_report
+    df.attrs['summary'] = summary_to_dict(summary)
+    return df
+
+
+def load_prepared_data(csv_path, geojson_path=GEOJSON_PATH, cache_dir=CACHE_DIR, compact=True, version=None):
+    # `version` : empreinte déjà calculée par l'appelant (évite de re-hasher le CSV)
+    version = version or dataset_fingerprint(csv_path, geojson_path)
+    cache_path = os.path.join(cache_dir, f"prepared-{version}{'-compact' if compact else ''}.parquet")
+
+    if os.path.exists(cache_path):
+        df = pd.read_parquet(cache_path)
+    else:
+        df = build_prepared_data(csv_path, geojson_path, compact=compact)
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(df, cache_path)
+        remove_stale(cache_dir, version)
+
+    df.attrs['dataset_version'] = version
+    return df
@@ -0,0 +1,103 @@
+import pandas as pd
+from utils.prep import POWER_CATEGORIES
+
+CUBE_DIMENSIONS = ['nom_operateur', 'departement', 'categorie_puissance', 'trimestre']
+
+
+def build_cube(df):
+    # Agrégat opérateur x département x catégorie de puissance x trimestre (fin de trimestre, NaT si non daté).
+    # Construit une fois par version du dataset : les graphiques n'interrogent plus les lignes brutes.
+    trimestre = df['date_mise_en_service'].dt.to_period('Q').dt.to_timestamp(how='end').dt.normalize()
+    cube = (
+        df.assign(trimestre=trimestre)
+        .groupby(CUBE_DIMENSIONS, observed=True, dropna=False)
+        .agg(nb_bornes=('nbre_pdc', 'size'), nb_pdc=('nbre_pdc', 'sum'))
+        .reset_index()
+    )
+    cube['nb_bornes'] = cube['nb_bornes'].astype('int64')
+    cube['nb_pdc'] = cube['nb_pdc'].astype('int64')
+    # même version que le dataset source : sert de clé aux données mémoïsées des sections
+    cube.attrs = {'dataset_version': df.attrs.get('dataset_version')}
+    return cube
+
+
+def _counts(cube, dims, value='nb_bornes'):
+    return cube.groupby(dims, observed=True)[value].sum()
+
+
+# --------------------------------- MARCHÉ ---------------------------------------
+def operator_counts(cube):
+    return _counts(cube, 'nom_operateur').sort_values(ascending=False, kind='stable')
+
+
+def operator_power_profile(cube, operators):
+    # Nombre de bornes par opérateur et catégorie de puissance, pour les opérateurs donnés
+    selection = cube[cube['nom_operateur'].isin(operators)]
+    profile = _counts(selection, ['nom_operateur', 'categorie_puissance']).reset_index()
+    profile['nom_operateur'] = profile['nom_operateur'].astype(str)
+    profile['categorie_puissance'] = profile['categorie_puissance'].astype(str)
+    return profile[profile['nb_bornes'] > 0]
+
+
+def market_shares(cube, n=10):
+    op_counts = operator_counts(cube)
+    op_counts.index = op_counts.index.astype(str)
+    top_op = op_counts.iloc[:n]
+    # Somme de toutes les bornes des opérateurs qui ne sont pas dans le top n
+    autres_sum = op_counts.iloc[n:].sum()
+    if autres_sum > 0:
+        top_op['Others'] = autres_sum
+    return top_op
+
+
+# --------------------------------- TERRITOIRE ------------------------------------
+def counts_by_departement(cube):
+    counts = _counts(cube, 'departement').sort_values(ascending=False, kind='stable').reset_index()
+    counts['departement'] = counts['departement'].astype(str)
+    return counts
+
+
+def departements(cube):
+    return sorted(cube['departement'].astype(str).unique())
+
+
+def top_operators_in_departement(cube, departement, n=5):
+    op_counts = _counts(cube[cube['departement'] == departement], 'nom_operateur')
+    op_counts = op_counts[op_counts > 0].sort_values(ascending=False, kind='stable').iloc[:n]
+    op_counts.index = op_counts.index.astype(str)
+    return op_counts
+
+
+# --------------------------------- TEMPS -----------------------------------------
+def _full_quarters(series):
+    # Complète les trimestres sans installation, comme un resample('QE')
+    if series.empty:
+        return series
+    quarters = pd.date_range(series.index.min(), series.index.max(), freq='QE')
+    return series.reindex(quarters, fill_value=0)
+
+
+def quarterly_installations(cube):
+    dated = cube[cube['trimestre'].notna()]
+    return _full_quarters(_counts(dated, 'trimestre'))
+
+
+def quarterly_by_power(cube):
+    dated = cube[cube['trimestre'].notna()]
+    pivot = _counts(dated, ['trimestre', 'categorie_puissance']).unstack('categorie_puissance', fill_value=0)
+    pivot = pivot.reindex(columns=POWER_CATEGORIES, fill_value=0)
+    pivot.columns = pivot.columns.astype(str)
+    if pivot.empty:
+        return pivot
+    quarters = pd.date_range(pivot.index.min(), pivot.index.max(), freq='QE')
+    return pivot.reindex(quarters, fill_value=0)
+
+
+def operator_growth(cube, operators):
+    # Parc cumulé par opérateur et par trimestre
+    dated = cube[cube['nom_operateur'].isin(operators) & cube['trimestre'].notna()]
+    growth = _counts(dated, ['nom_operateur', 'trimestre']).reset_index(name='installations')
+    growth = growth[growth['installations'] > 0]
+    growth['nom_operateur'] = growth['nom_operateur'].astype(str)
+    growth['parc_cumulé'] = growth.groupby('nom_operateur')['installations'].cumsum()
+    return growth
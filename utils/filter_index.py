@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from utils.memory import FLAG_COLUMNS, flag_mask
+
+CATEGORY_FILTERS = ['nom_operateur', 'condition_acces']
+RANGE_FILTERS = ['puissance_nominale', 'nbre_pdc']
+# Colonnes triables du tableau détaillé (ordre tiré des index de filtres) et colonnes de la recherche texte
+SORT_COLUMNS = CATEGORY_FILTERS + RANGE_FILTERS
+TEXT_SEARCH_COLUMNS = ['nom_operateur', 'adresse_station']
+
+PRISE_MAPPING = {
+    'Type 2': 'prise_type_2',
+    'Combo CCS': 'prise_type_combo_ccs',
+    'CHAdeMO': 'prise_type_chademo',
+    'Type EF / Domestique': 'prise_type_ef'
+}
+PAIEMENT_MAPPING = {
+    'Payment by credit card': 'paiement_cb',
+    'Pay-as-you-go': 'paiement_acte',
+    'Other payment methods': 'paiement_autre'
+}
+# Valeurs "pas de filtre" des widgets
+ALL_OPERATORS = 'All operators'
+ALL_CONDITIONS = 'All conditions'
+ALL_TYPES = 'All types'
+
+
+def selection_key(operateur=None, acces=None, prise=None, paiements=(), puissance=None, pdc=None):
+    # Sélection normalisée : libellés des widgets (ou noms de colonnes) -> arguments de FilterIndex.resolve.
+    # Deux sélections équivalentes ont la même clé (cache des résultats, requêtes par lots).
+    return (
+        None if operateur in (None, ALL_OPERATORS) else operateur,
+        None if acces in (None, ALL_CONDITIONS) else acces,
+        None if prise in (None, ALL_TYPES) else PRISE_MAPPING.get(prise, prise),
+        tuple(sorted(PAIEMENT_MAPPING.get(opt, opt) for opt in paiements or ())),
+        None if puissance is None else tuple(puissance),
+        None if pdc is None else tuple(pdc),
+    )
+
+
+class FilterIndex:
+    # Index construit une fois par version du dataset. Une combinaison de filtres se résout
+    # en intersectant des bitmaps (1 bit par ligne), puis en un seul df.take des positions retenues.
+
+    def __init__(self, df):
+        self.n = len(df)
+        # filtres catégoriels : positions des lignes triées par valeur
+        self.positions = {col: self._positions_by_value(df[col]) for col in CATEGORY_FILTERS}
+        # drapeaux prise / paiement : bitmaps compactés
+        self.bitmaps = {col: np.packbits(flag_mask(df, col)) for col in FLAG_COLUMNS}
+        # filtres de plage : valeurs triées (NaN exclus) et positions correspondantes
+        self.sorted_values = {}
+        self.sorted_positions = {}
+        for col in RANGE_FILTERS:
+            values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            valid = np.flatnonzero(~np.isnan(values))
+            order = valid[np.argsort(values[valid], kind='stable')]
+            self.sorted_values[col] = values[order]
+            self.sorted_positions[col] = order.astype(np.int32)
+        self._all = np.packbits(np.ones(self.n, dtype=bool))
+
+        # rang de la valeur de chaque ligne pour chaque colonne triable (-1 = valeur manquante)
+        self.ranks = {}
+        for col in SORT_COLUMNS:
+            rank = np.full(self.n, -1, dtype=np.int32)
+            if col in CATEGORY_FILTERS:
+                by_value = self.positions[col]
+                for i, value in enumerate(sorted(by_value, key=str)):
+                    rank[by_value[value]] = i
+            else:
+                values = self.sorted_values[col]
+                # rang dense : les valeurs égales partagent le même rang
+                rank[self.sorted_positions[col]] = np.cumsum(np.r_[False, values[1:] != values[:-1]])
+            self.ranks[col] = rank
+
+        # recherche texte : valeurs distinctes normalisées et code de chaque ligne
+        self.text_codes = {}
+        self.text_values = {}
+        for col in TEXT_SEARCH_COLUMNS:
+            codes, uniques = pd.factorize(df[col])
+            self.text_codes[col] = codes.astype(np.int32)
+            self.text_values[col] = pd.Series(uniques, dtype=object).astype(str).str.casefold()
+
+    @staticmethod
+    def _positions_by_value(series):
+        codes, uniques = pd.factorize(series)
+        order = np.argsort(codes, kind='stable').astype(np.int32)
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        return {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(uniques)}
+
+    def _bitmap(self, positions):
+        mask = np.zeros(self.n, dtype=bool)
+        mask[positions] = True
+        return np.packbits(mask)
+
+    def value_positions(self, col, value):
+        return self.positions[col].get(value, np.empty(0, dtype=np.int32))
+
+    def range_positions(self, col, low, high):
+        # bornes incluses, comme Series.between
+        values = self.sorted_values[col]
+        start = np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, high, side='right')
+        return self.sorted_positions[col][start:stop]
+
+    def filter_bitmap(self, name, value):
+        # Bitmap d'un seul filtre, `name` étant un argument de resolve
+        if name == 'operateur':
+            return self._bitmap(self.value_positions('nom_operateur', value))
+        if name == 'acces':
+            return self._bitmap(self.value_positions('condition_acces', value))
+        if name == 'prise':
+            return self.bitmaps[value]
+        if name == 'paiements':
+            # moyens de paiement : au moins un des moyens choisis
+            return np.bitwise_or.reduce([self.bitmaps[col] for col in value])
+        if name == 'puissance':
+            return self._bitmap(self.range_positions('puissance_nominale', *value))
+        return self._bitmap(self.range_positions('nbre_pdc', *value))
+
+    def combine(self, bitmaps):
+        # Positions (triées) des lignes présentes dans tous les bitmaps
+        result = np.bitwise_and.reduce(bitmaps) if bitmaps else self._all
+        return np.flatnonzero(np.unpackbits(result, count=self.n))
+
+    def resolve(self, operateur=None, acces=None, prise=None, paiements=(), puissance=None, pdc=None):
+        # Renvoie les positions (triées) des lignes qui passent tous les filtres.
+        # prise / paiements sont des noms de colonnes, puissance / pdc des tuples (min, max).
+        filters = {'operateur': operateur, 'acces': acces, 'prise': prise, 'paiements': paiements, 'puissance': puissance, 'pdc': pdc}
+        return self.combine([self.filter_bitmap(name, value) for name, value in filters.items() if value not in (None, ())])
+
+    def search(self, text):
+        # Positions (triées) des lignes dont l'opérateur ou l'adresse contient le texte, sans tenir compte de la casse.
+        # Le test ne porte que sur les valeurs distinctes, puis se propage aux lignes par leur code.
+        mask = np.zeros(self.n, dtype=bool)
+        needle = text.casefold()
+        for col in TEXT_SEARCH_COLUMNS:
+            matched = np.flatnonzero(self.text_values[col].str.contains(needle, regex=False).to_numpy())
+            if len(matched):
+                mask |= np.isin(self.text_codes[col], matched)
+        return np.flatnonzero(mask)
+
+    def sort(self, positions, col, descending=False):
+        # Réordonne des positions selon une colonne triable ; tri stable, valeurs manquantes en dernier
+        rank = self.ranks[col][positions].astype(np.int64)
+        missing = rank < 0
+        rank = -rank if descending else rank
+        rank[missing] = np.iinfo(np.int64).max
+        return positions[np.argsort(rank, kind='stable')]
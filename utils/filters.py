@@ -1,10 +1,74 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
+from utils.cache import dataset_version
+from utils.filter_index import FilterIndex, PAIEMENT_MAPPING, ALL_OPERATORS, ALL_CONDITIONS, ALL_TYPES, selection_key
+from utils.result_cache import ResultCache
+from utils.render import section_data
+from utils.perf import timed
+from utils.sketch import dataset_summary
+from utils.artifacts import artifacts_for
+
+
+@st.cache_resource(max_entries=2)
+def get_filter_index(_df, version):
+    # Un seul index par version du dataset, partagé entre les sessions ; lu dans le build s'il existe
+    artifacts = artifacts_for(version)
+    return artifacts.filter_index if artifacts else FilterIndex(_df)
+
+
+@st.cache_resource
+def get_filter_cache():
+    # Résultats des combinaisons de filtres déjà demandées, toutes sessions confondues
+    return ResultCache()
+
+
+def compute_kpis(df, positions):
+    # Seules les deux colonnes utiles sont lues aux positions retenues : aucune copie du DataFrame
+    pdc = df['nbre_pdc'].take(positions).to_numpy(dtype='float64', na_value=np.nan)
+    power = df['puissance_nominale'].take(positions).to_numpy(dtype='float64', na_value=np.nan)
+    rated = ~np.isnan(power)
+    return {
+        'count': len(positions),
+        'pdc': int(np.nansum(pdc)),
+        'power_mean': float(power[rated].mean()) if rated.any() else float('nan'),
+    }
+
+
+def summary_kpis(summary):
+    # Mêmes KPIs que compute_kpis, lus dans le résumé calculé à l'ingestion
+    return {
+        'count': summary['rows'],
+        'pdc': int(summary['columns']['nbre_pdc'].total),
+        'power_mean': summary['columns']['puissance_nominale'].mean,
+    }
+
+
+def filter_result_size(result):
+    return result['positions'].nbytes + 256
+
+
+@section_data('sidebar_options')
+def filter_options(df):
+    # Options et bornes des widgets, calculées une fois par version du dataset
+    # bornes lues dans les résumés d'ingestion (min exact, quantiles du t-digest)
+    summary = dataset_summary(df)['columns']
+    operateurs_options = [ALL_OPERATORS] + sorted(df['nom_operateur'].unique())
+    puissance_bounds = (
+        int(summary['puissance_nominale'].minimum),#borne inf
+        int(summary['puissance_nominale'].quantile(0.99)), # avoid outliers/ borne sup
+    )
+    pdc_bounds = (
+        int(summary['nbre_pdc'].minimum),#borne inf
+        int(summary['nbre_pdc'].quantile(0.995)), #borne sup
+    )
+    return operateurs_options, puissance_bounds, pdc_bounds
 
 
+@timed
 def display_logical_filters(df):
+    operateurs_options, (puissance_min, puissance_max_realiste), (pdc_min, pdc_max_realiste) = filter_options(df)
     # -------------------------------Filtre 1 ------------------------------
-    operateurs_options = ['All operators'] + sorted(df['nom_operateur'].unique())
     selected_operateur = st.sidebar.selectbox(
         "Operator :",
         options=operateurs_options
@@ -12,9 +76,6 @@ def display_logical_filters(df):
 
     #-----------------------------FILTRE 2----------------------------------------------
 
-    puissance_min = int(df['puissance_nominale'].min())#borne inf
-    puissance_max_realiste = int(df['puissance_nominale'].quantile(0.99)) # avoid outliers/ borne sup
-
     selected_power = st.sidebar.slider(
         "Power range (kW):",
         min_value=puissance_min,
@@ -24,9 +85,6 @@ def display_logical_filters(df):
 
     # --------------------------- Filtre 3 -----------------------------------
 
-    pdc_min = int(df['nbre_pdc'].min())#borne inf
-    pdc_max_realiste = int(df['nbre_pdc'].quantile(0.995)) #borne sup
-
     selected_pdc = st.sidebar.slider(
         "Number of charging points:",
         min_value=pdc_min,
@@ -35,7 +93,7 @@ def display_logical_filters(df):
     )
 
     # -------------------------------- Filtre 4 ---------------------------------
-    acces_options = ['All conditions'] + ['Accès libre']+['Accès réservé']
+    acces_options = [ALL_CONDITIONS] + ['Accès libre']+['Accès réservé']
     selected_acces = st.sidebar.selectbox(
         "Conditions of access:",
         options=acces_options
@@ -43,7 +101,7 @@ def display_logical_filters(df):
 
     # -------------------------------- Filtre 5 -------------------------------
     prise_options = [
-        'All types', 
+        ALL_TYPES, 
         'Type 2', 
         'Combo CCS', 
         'CHAdeMO', 
@@ -55,51 +113,22 @@ def display_logical_filters(df):
     )
 
     # ------------------------FILTRE 6 : -------------------------
-    paiement_options = [
-        'Payment by credit card',
-        'Pay-as-you-go',
-        'Other payment methods'
-    ]
+    paiement_options = list(PAIEMENT_MAPPING)
     selected_paiement = st.sidebar.multiselect(
         "Accepted payment methods:",
         options=paiement_options
     )
 
-    df_filtered = df.copy()
-
-
     # ---------------------------- LOGIC DE FILATRAGE------------------------------------------
-    if selected_operateur != 'All operators':
-        df_filtered = df_filtered[df_filtered['nom_operateur'] == selected_operateur]
-
-    if selected_acces != 'All conditions':
-        df_filtered = df_filtered[df_filtered['condition_acces'] == selected_acces]
-
-    if selected_prise != 'All types':
-        prise_mapping = {
-            'Type 2': 'prise_type_2',
-            'Combo CCS': 'prise_type_combo_ccs',
-            'CHAdeMO': 'prise_type_chademo',
-            'Type EF / Domestique': 'prise_type_ef'
-        }
-        colonne_prise = prise_mapping[selected_prise]
-        
-        if colonne_prise in df_filtered.columns:
-            df_filtered = df_filtered[df_filtered[colonne_prise].fillna(False) == True]
-        
-
-    if selected_paiement:
-        paiement_mapping = {
-            'Payment by credit card': 'paiement_cb',
-            'Pay-as-you-go': 'paiement_acte',
-            'Other payment methods': 'paiement_autre'
-        }
-        selected_cols = [paiement_mapping[opt] for opt in selected_paiement]
-        df_filtered = df_filtered[df_filtered[selected_cols].any(axis=1)]
-
-    df_filtered = df_filtered[
-        df_filtered['puissance_nominale'].between(selected_power[0], selected_power[1]) &
-        df_filtered['nbre_pdc'].between(selected_pdc[0], selected_pdc[1])
-    ]
-
-    return df_filtered
+    # Sélection normalisée : deux sessions avec les mêmes choix partagent la même clé de cache
+    selection = selection_key(selected_operateur, selected_acces, selected_prise, selected_paiement, selected_power, selected_pdc)
+    version = dataset_version(df)
+
+    def compute():
+        # Résolu par l'index de filtres (bitmaps + tableaux triés), sans copie intermédiaire du DataFrame
+        operateur, acces, prise, paiements, puissance, pdc = selection
+        positions = get_filter_index(df, version).resolve(operateur, acces, prise, paiements, puissance, pdc)
+        return {'positions': positions, 'kpis': compute_kpis(df, positions)}
+
+    # positions des lignes retenues et KPIs : les lignes elles-mêmes ne sont matérialisées que page par page
+    return get_filter_cache().get_or_compute(version, selection, compute, sizeof=filter_result_size)
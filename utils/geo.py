@@ -0,0 +1,54 @@
+import json
+import numpy as np
+import shapely
+from functools import lru_cache
+from utils.io import GEOJSON_PATH
+
+# Variantes simplifiées des contours (tolérance en degrés, 0 = géométrie d'origine)
+SIMPLIFY_TOLERANCES = {
+    'full': 0,
+    'detailed': 0.02,
+    'balanced': 0.05,
+    'light': 0.1,
+}
+# Variante utilisée par les cartes choroplèthes
+CHOROPLETH_VARIANT = 'balanced'
+# Décimales conservées dans le GeoJSON envoyé au navigateur (~10 m)
+COORDINATE_DECIMALS = 4
+
+
+class GeometryStore:
+    # Contours des départements, lus une seule fois par process et partagés entre
+    # l'affectation spatiale (géométrie exacte) et les cartes (variantes simplifiées)
+
+    def __init__(self, geojson_path=GEOJSON_PATH, tolerances=SIMPLIFY_TOLERANCES):
+        with open(geojson_path, 'r', encoding='utf-8') as f:
+            features = json.load(f)['features']
+        self.codes = np.array([feature['properties']['code'] for feature in features], dtype=object)
+        self.names = np.array([feature['properties'].get('nom') for feature in features], dtype=object)
+        self.geometries = shapely.from_geojson([json.dumps(feature['geometry']) for feature in features])
+
+        # simplification de couverture : les frontières communes restent partagées (ni trou ni chevauchement)
+        self.variants = {
+            name: shapely.coverage_simplify(self.geometries, tolerance) if tolerance else self.geometries
+            for name, tolerance in tolerances.items()
+        }
+        self._geojson = {}
+
+    def geojson(self, variant=CHOROPLETH_VARIANT):
+        # FeatureCollection allégée (code du département seulement, coordonnées arrondies)
+        if variant not in self._geojson:
+            rounded = shapely.transform(self.variants[variant], lambda coords: np.round(coords, COORDINATE_DECIMALS))
+            self._geojson[variant] = {
+                'type': 'FeatureCollection',
+                'features': [
+                    {'type': 'Feature', 'properties': {'code': code}, 'geometry': json.loads(geometry)}
+                    for code, geometry in zip(self.codes, shapely.to_geojson(rounded))
+                ],
+            }
+        return self._geojson[variant]
+
+
+@lru_cache(maxsize=None)
+def get_geometry_store(geojson_path=GEOJSON_PATH):
+    return GeometryStore(geojson_path)
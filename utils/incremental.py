@@ -0,0 +1,221 @@
+import glob
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from utils.io import iter_data, GEOJSON_PATH
+from utils.prep import prepare_data, colonnes_a_garder
+from utils.schema import read_dtypes, merge_reports, COERCED_COLUMNS
+from utils.memory import compact_frame, memory_report, frame_bytes, mask_counts
+from utils.validation import RULE_NAMES
+from utils.operators import operator_names, save_operator_lookup
+from utils.sketch import summarize, merge_summaries, summary_to_dict, summary_from_dict
+from utils.cache import CACHE_DIR, file_fingerprint, prep_fingerprint, dataset_fingerprint
+
+# Identifiant stable d'un point de charge dans le fichier consolidé IRVE
+KEY_COLUMN = 'id_pdc_itinerance'
+STATE_DIR = os.path.join(CACHE_DIR, "incremental")
+# Fichier pointant vers l'état courant : sa mise à jour (os.replace) rend la fusion atomique
+CURRENT_FILE = "CURRENT"
+# Mode d'ingestion de l'application : DATAVIZ_INGEST=incremental active la mise à jour par différence
+INCREMENTAL_INGEST = os.environ.get('DATAVIZ_INGEST') == 'incremental'
+
+
+def row_keys(ids, seen):
+    # Clé de ligne = hash(identifiant PDC, numéro d'occurrence) : un identifiant présent plusieurs fois
+    # dans le fichier donne plusieurs clés distinctes. `seen` compte les occurrences des blocs précédents
+    # (indexé par le hash de l'identifiant).
+    id_hashes = pd.Series(pd.util.hash_pandas_object(ids.astype(object).fillna(''), index=False).to_numpy())
+    previous = seen.index.get_indexer(id_hashes)
+    occurrence = id_hashes.groupby(id_hashes, sort=False).cumcount().to_numpy(copy=True)
+    known = previous >= 0
+    occurrence[known] += seen.to_numpy()[previous[known]].astype(occurrence.dtype)
+    keys = pd.util.hash_pandas_object(pd.DataFrame({'id': id_hashes, 'occurrence': occurrence}), index=False)
+    seen = seen.add(id_hashes.value_counts(), fill_value=0)
+    return keys.to_numpy().view('int64'), seen
+
+
+def row_hashes(chunk):
+    # Empreinte du contenu brut des colonnes préparées : une ligne modifiée change d'empreinte
+    return pd.util.hash_pandas_object(chunk[colonnes_a_garder], index=False).to_numpy()
+
+
+def _read_state(state_dir):
+    try:
+        with open(os.path.join(state_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            current = os.path.join(state_dir, f.read().strip())
+        with open(os.path.join(current, "meta.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        manifest = pd.read_parquet(os.path.join(current, "manifest.parquet"))
+        prepared = pd.read_parquet(os.path.join(current, "prepared.parquet"))
+    except (OSError, ValueError):
+        return None
+    return meta, manifest, prepared
+
+
+def _write_state(state_dir, meta, manifest, prepared):
+    # Nouvel état écrit à côté de l'ancien, puis bascule du pointeur CURRENT :
+    # un lecteur voit toujours soit l'ancien état complet, soit le nouveau
+    name = meta['dataset_version']
+    tmp_dir = os.path.join(state_dir, f"{name}.{os.getpid()}.tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    manifest.to_parquet(os.path.join(tmp_dir, "manifest.parquet"))
+    prepared.to_parquet(os.path.join(tmp_dir, "prepared.parquet"))
+    with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    final_dir = os.path.join(state_dir, name)
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    pointer = os.path.join(state_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(state_dir, CURRENT_FILE))
+
+    for path in glob.glob(os.path.join(state_dir, "*")):
+        if os.path.isdir(path) and os.path.basename(path) != name:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _coercion_report(flags, reports):
+    # Lignes en échec recomptées sur les drapeaux des lignes présentes : une ligne supprimée ou
+    # corrigée ne compte plus. Les exemples sont ceux des préparations successives.
+    examples = merge_reports(reports)
+    return {
+        col: {'failed_rows': rows, 'examples': examples.get(col, {}).get('examples', [])}
+        for col, rows in mask_counts(flags, COERCED_COLUMNS).items() if rows
+    }
+
+
+def refresh_prepared_data(csv_path, geojson_path=GEOJSON_PATH, state_dir=STATE_DIR, version=None):
+    # Ingestion incrémentale : les lignes sont appariées à l'état précédent par leur clé, et seules les
+    # lignes insérées ou modifiées repassent par prepare_data (normalisation + affectation au département)
+    version = version or dataset_fingerprint(csv_path, geojson_path)
+    state = _read_state(state_dir)
+    geojson_fingerprint = file_fingerprint(geojson_path)
+    code = prep_fingerprint()
+    if state and (state[0]['geojson'] != geojson_fingerprint or state[0]['code'] != code
+                  or not {'coercion', 'validation'} <= set(state[1].columns)):
+        state = None  # contours, code de préparation, alias ou format du manifeste modifiés : tout est à refaire
+
+    if state and state[0]['dataset_version'] == version:
+        meta, _, prepared = state
+    else:
+        if state:
+            meta, old_manifest, old_prepared = state
+        else:
+            meta, old_manifest, old_prepared = {}, pd.DataFrame({'key': [], 'hash': [], 'coercion': [], 'validation': []}), None
+        old_index = pd.Index(old_manifest['key'].to_numpy(dtype='int64'))
+        old_hashes = old_manifest['hash'].to_numpy(dtype='uint64')
+        # drapeaux de chaque ligne source : échecs de conversion (utils.schema.COERCED_COLUMNS)
+        # et règles de validation (utils.validation.RULE_NAMES)
+        old_coercion = old_manifest['coercion'].to_numpy(dtype='uint16')
+        old_validation = old_manifest['validation'].to_numpy(dtype='uint8')
+
+        # rapport mémoire (avant / après compactage) recalculé seulement lors d'une préparation complète
+        before_bytes = None if state else pd.Series(dtype='int64')
+        seen = pd.Series(dtype='int64', index=pd.Index([], dtype='uint64'))
+        keys, hashes, coercion, validation, delta, reports, summaries = [], [], [], [], [], [], []
+        # clés de toutes les lignes re-préparées, qu'elles aient passé la validation et la jointure ou non
+        changed_keys = []
+        names = set()
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        dtype = dict(read_dtypes(), **{KEY_COLUMN: str})
+        for chunk in iter_data(csv_path, usecols=[KEY_COLUMN] + colonnes_a_garder, dtype=dtype):
+            chunk_keys, seen = row_keys(chunk[KEY_COLUMN], seen)
+            chunk_hashes = row_hashes(chunk)
+            names.update(operator_names(chunk['nom_operateur']))
+            previous = old_index.get_indexer(chunk_keys)
+            inserted = previous < 0
+            updated = np.zeros(len(chunk), dtype=bool)
+            updated[~inserted] = old_hashes[previous[~inserted]] != chunk_hashes[~inserted]
+            changed = inserted | updated
+            counts['inserted'] += int(inserted.sum())
+            counts['updated'] += int(updated.sum())
+            counts['unchanged'] += int((~changed).sum())
+            chunk_coercion = np.zeros(len(chunk), dtype='uint16')
+            chunk_coercion[~changed] = old_coercion[previous[~changed]]
+            chunk_validation = np.zeros(len(chunk), dtype='uint8')
+            chunk_validation[~changed] = old_validation[previous[~changed]]
+
+            if changed.any():
+                # les lignes préparées sont indexées par leur clé pour les fusions suivantes
+                rows = chunk[changed].set_axis(chunk_keys[changed])
+                changed_keys.append(chunk_keys[changed])
+                prepared_rows, row_flags = prepare_data(rows, geojson_path=geojson_path, with_row_flags=True)
+                chunk_coercion[changed] = row_flags['coercion'].to_numpy()
+                chunk_validation[changed] = row_flags['validation'].to_numpy()
+                reports.append(prepared_rows.attrs['coercion_report'])
+                summaries.append(summarize(prepared_rows))
+                compacted = compact_frame(prepared_rows)
+                if before_bytes is not None:
+                    before_bytes = before_bytes.add(memory_report(prepared_rows, compacted)['before'], fill_value=0)
+                delta.append(compacted)
+            keys.append(chunk_keys)
+            hashes.append(chunk_hashes)
+            coercion.append(chunk_coercion)
+            validation.append(chunk_validation)
+
+        keys = np.concatenate(keys) if keys else np.empty(0, dtype='int64')
+        hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype='uint64')
+        coercion = np.concatenate(coercion) if coercion else np.empty(0, dtype='uint16')
+        validation = np.concatenate(validation) if validation else np.empty(0, dtype='uint8')
+        new_index = pd.Index(keys)
+        counts['deleted'] = int((new_index.get_indexer(old_index) < 0).sum())
+
+        frames = delta
+        if old_prepared is not None:
+            # lignes conservées telles quelles : ni supprimées, ni modifiées (la nouvelle version, si elle
+            # est désormais rejetée, n'est pas dans delta : l'ancienne ne doit pas rester pour autant)
+            replaced = ~old_prepared.index.isin(new_index) | old_prepared.index.isin(
+                np.concatenate(changed_keys) if changed_keys else []
+            )
+            frames = [old_prepared[~replaced]] + delta
+        prepared = pd.concat(frames) if frames else pd.DataFrame()
+        # même ordre de lignes que le fichier source, comme une préparation complète
+        order = np.argsort(new_index.get_indexer(prepared.index), kind='stable')
+        prepared = compact_frame(prepared.iloc[order])
+        prepared.attrs = {}
+
+        memory = meta.get('memory_report')
+        if before_bytes is not None:
+            after_bytes = frame_bytes(prepared)
+            after_bytes['total'] = after_bytes.sum()
+            memory = {col: [int(before_bytes[col]), int(after_bytes[col])] for col in after_bytes.index if col in before_bytes}
+
+        if state and 'summary' in meta and counts['updated'] == 0 and counts['deleted'] == 0:
+            # ajouts seuls : les résumés des nouvelles lignes se fusionnent avec l'ancien
+            summary = merge_summaries([summary_from_dict(meta['summary'])] + summaries)
+        elif state:
+            # un résumé ne se "défusionne" pas : lignes modifiées ou supprimées, il est recalculé
+            summary = summarize(prepared)
+        else:
+            summary = merge_summaries(summaries)
+
+        old_report = meta.get('coercion_report', {})
+        meta = {
+            'dataset_version': version,
+            'geojson': geojson_fingerprint,
+            'code': code,
+            'ingest_report': counts,
+            'coercion_report': _coercion_report(coercion, [old_report] + reports),
+            # compteurs par règle sur les lignes présentes, comme les échecs de conversion
+            'validation_report': mask_counts(validation, RULE_NAMES),
+            'memory_report': memory,
+            'summary': summary_to_dict(summary),
+        }
+        manifest = pd.DataFrame({'key': keys, 'hash': hashes, 'coercion': coercion, 'validation': validation})
+        os.makedirs(state_dir, exist_ok=True)
+        _write_state(state_dir, meta, manifest, prepared)
+        # noms de toutes les lignes du fichier, re-préparées ou non
+        save_operator_lookup(names)
+
+    prepared.attrs['dataset_version'] = version
+    prepared.attrs['coercion_report'] = meta['coercion_report']
+    prepared.attrs['validation_report'] = meta['validation_report']
+    prepared.attrs['ingest_report'] = meta['ingest_report']
+    prepared.attrs['summary'] = meta['summary']
+    if meta.get('memory_report'):
+        prepared.attrs['memory_report'] = meta['memory_report']
+    return prepared
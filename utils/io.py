@@ -1,9 +1,22 @@
+import os
 import pandas as pd
-import io
 
-def load_data(path):
-    # Ouvre le fichier en ignorant les caractères problématiques
+# Fichier source ; DATAVIZ_CSV permet de servir un autre fichier (jeu synthétique des benchmarks)
+DATA_PATH = os.environ.get('DATAVIZ_CSV', "data/station_electrique.csv")
+GEOJSON_PATH = "data/departements-version-simplifiee.geojson"
+
+# Taille des blocs lus en mode streaming : le pic mémoire dépend de cette valeur, pas de la taille du fichier
+CHUNK_ROWS = 100_000
+
+def load_data(path, usecols=None, nrows=None, dtype=None):
+    # Décode à la volée en ignorant les caractères problématiques, sans charger tout le fichier en str
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        df = pd.read_csv(f, usecols=usecols, nrows=nrows, dtype=dtype, low_memory=False)
+    return df
+
+def iter_data(path, usecols=None, chunksize=CHUNK_ROWS, dtype=None):
+    # Même lecture que load_data mais par blocs de `chunksize` lignes
     with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-    df = pd.read_csv(io.StringIO(content), low_memory=False)
-    return df
\ No newline at end of file
+        with pd.read_csv(f, usecols=usecols, chunksize=chunksize, dtype=dtype, low_memory=False) as reader:
+            for chunk in reader:
+                yield chunk
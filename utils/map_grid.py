@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# Résolutions de la carte agrégée : pas de la grille en degrés, du plus grossier au plus fin
+MAP_RESOLUTIONS = {
+    'France': 0.5,
+    'Region': 0.2,
+    'Department': 0.1,
+    'City': 0.02,
+}
+# En dessous de ce nombre de bornes, la carte reçoit les points bruts
+MAP_RAW_POINTS_MAX = 5_000
+# Nombre maximal de cellules envoyées au navigateur en mode automatique
+MAP_CELL_BUDGET = 3_000
+
+# Conversion approximative degrés -> mètres pour la taille des cercles
+_METERS_PER_DEGREE = 111_000
+
+
+class MapGrid:
+    # Affectation ligne -> cellule précalculée pour chaque résolution, une fois par version du dataset.
+    # Changer de filtres ne fait plus que ré-agréger des identifiants de cellule entiers (bincount).
+
+    def __init__(self, df, resolutions=MAP_RESOLUTIONS):
+        lon = df['consolidated_longitude'].to_numpy(dtype='float64', na_value=np.nan)
+        lat = df['consolidated_latitude'].to_numpy(dtype='float64', na_value=np.nan)
+        self.pdc = df['nbre_pdc'].to_numpy(dtype='float64', na_value=0)
+        valid = ~(np.isnan(lon) | np.isnan(lat))
+        self.resolutions = dict(resolutions)
+        self.cell_ids = {}
+        self.centers = {}
+        for name, step in self.resolutions.items():
+            ix = np.floor(lon[valid] / step).astype(np.int64)
+            iy = np.floor(lat[valid] / step).astype(np.int64)
+            # identifiants denses : seules les cellules occupées existent
+            keys, inverse = np.unique(ix + 1j * iy, return_inverse=True)
+            cell_ids = np.full(len(df), -1, dtype=np.int32)
+            cell_ids[valid] = inverse.ravel()
+            self.cell_ids[name] = cell_ids
+            # centre géométrique de chaque cellule
+            self.centers[name] = ((keys.imag + 0.5) * step, (keys.real + 0.5) * step)
+
+    def n_cells(self, resolution):
+        return len(self.centers[resolution][0])
+
+    def auto_resolution(self, positions, budget=MAP_CELL_BUDGET):
+        # Résolution la plus fine dont le nombre de cellules occupées tient dans le budget
+        chosen = next(iter(self.resolutions))
+        for name in self.resolutions:
+            ids = self.cell_ids[name][positions]
+            if np.count_nonzero(np.bincount(ids[ids >= 0], minlength=self.n_cells(name))) > budget:
+                break
+            chosen = name
+        return chosen
+
+    def aggregate(self, positions, resolution):
+        # Nombre de bornes et somme des PDC par cellule, pour les lignes retenues par les filtres
+        ids = self.cell_ids[resolution][positions]
+        keep = ids >= 0
+        ids = ids[keep]
+        n_cells = self.n_cells(resolution)
+        counts = np.bincount(ids, minlength=n_cells)
+        pdc = np.bincount(ids, weights=self.pdc[positions][keep], minlength=n_cells)
+        occupied = np.flatnonzero(counts)
+        lat, lon = self.centers[resolution]
+        return pd.DataFrame({
+            'latitude': lat[occupied],
+            'longitude': lon[occupied],
+            'nb_bornes': counts[occupied],
+            'nb_pdc': pdc[occupied].astype('int64'),
+        })
+
+
+def cell_sizes(cells, step):
+    # Rayon en mètres proportionnel à la racine du nombre de bornes, borné à une demi-cellule
+    if cells.empty:
+        return cells['nb_bornes'].astype('float64')
+    scale = np.sqrt(cells['nb_bornes'] / cells['nb_bornes'].max())
+    return scale * step * _METERS_PER_DEGREE / 2
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Colonnes texte à faible cardinalité : stockées en category
+CATEGORY_COLUMNS = ['nom_operateur', 'departement', 'condition_acces', 'adresse_station', 'reservation']
+FLOAT32_COLUMNS = ['consolidated_longitude', 'consolidated_latitude', 'puissance_nominale']
+
+# Booléens regroupés dans un seul octet 'flags' : le bit i correspond à FLAG_COLUMNS[i]
+FLAG_COLUMNS = [
+    'prise_type_ef', 'prise_type_2', 'prise_type_combo_ccs',
+    'prise_type_chademo', 'prise_type_autre',
+    'paiement_acte', 'paiement_cb', 'paiement_autre'
+]
+FLAGS_COLUMN = 'flags'
+
+
+def _smallest_int(series):
+    values = series.dropna()
+    if values.empty:
+        return 'Int8'
+    low, high = int(values.min()), int(values.max())
+    for dtype, info in (('Int8', np.iinfo(np.int8)), ('Int16', np.iinfo(np.int16)), ('Int32', np.iinfo(np.int32))):
+        if info.min <= low and high <= info.max:
+            return dtype
+    return 'Int64'
+
+
+def pack_flags(df):
+    flags = np.zeros(len(df), dtype=np.uint8)
+    for bit, col in enumerate(FLAG_COLUMNS):
+        flags |= df[col].to_numpy(dtype=bool).astype(np.uint8) << bit
+    return flags
+
+
+def pack_masks(masks, names, n_rows, dtype=np.uint16):
+    # Masques par ligne regroupés dans un entier : le bit i correspond à names[i] (masque absent = False)
+    flags = np.zeros(n_rows, dtype=dtype)
+    for bit, name in enumerate(names):
+        if name in masks:
+            flags |= np.asarray(masks[name], dtype=bool).astype(dtype) << bit
+    return flags
+
+
+def mask_counts(flags, names):
+    return {name: int(((flags >> bit) & 1).sum()) for bit, name in enumerate(names)}
+
+
+def flag_mask(df, col):
+    # Masque booléen d'une colonne prise_type_* / paiement_*, que les drapeaux soient compactés ou non
+    if col in df.columns:
+        return df[col].fillna(False).to_numpy(dtype=bool)
+    bit = FLAG_COLUMNS.index(col)
+    return (df[FLAGS_COLUMN].to_numpy() >> bit) & 1 == 1
+
+
+def unpack_flags(df):
+    # Restaure les colonnes booléennes (pour l'affichage des tableaux)
+    if FLAGS_COLUMN not in df.columns:
+        return df
+    df_unpacked = df.drop(columns=[FLAGS_COLUMN])
+    position = df.columns.get_loc(FLAGS_COLUMN)
+    for offset, col in enumerate(FLAG_COLUMNS):
+        df_unpacked.insert(position + offset, col, flag_mask(df, col))
+    return df_unpacked
+
+
+def compact_frame(df):
+    df_compact = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df_compact.columns:
+            df_compact[col] = df_compact[col].astype('category')
+    for col in FLOAT32_COLUMNS:
+        if col in df_compact.columns:
+            df_compact[col] = df_compact[col].astype('float32')
+    if 'nbre_pdc' in df_compact.columns:
+        df_compact['nbre_pdc'] = df_compact['nbre_pdc'].astype(_smallest_int(df_compact['nbre_pdc']))
+
+    if all(col in df_compact.columns for col in FLAG_COLUMNS):
+        position = df_compact.columns.get_loc(FLAG_COLUMNS[0])
+        flags = pack_flags(df_compact)
+        df_compact = df_compact.drop(columns=FLAG_COLUMNS)
+        df_compact.insert(position, FLAGS_COLUMN, flags)
+    return df_compact
+
+
+def frame_bytes(df):
+    # Octets par colonne. Les catégories sont comptées sans le cache de leur index, qu'un pickle
+    # (retour d'un worker) ne conserve pas : la mesure ne dépend pas du chemin suivi par les données.
+    sizes = df.memory_usage(deep=True, index=False)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = pd.Series(df[col].cat.categories)
+            sizes[col] = df[col].cat.codes.nbytes + categories.memory_usage(deep=True, index=False)
+    return sizes
+
+
+def memory_report(before, after):
+    # Octets par colonne avant / après compactage ; `before` est un DataFrame ou ses octets par colonne
+    bytes_before = before if isinstance(before, pd.Series) else frame_bytes(before)
+    bytes_after = frame_bytes(after)
+    if FLAGS_COLUMN in bytes_after.index:
+        bytes_before = pd.concat([
+            bytes_before.drop(FLAG_COLUMNS, errors='ignore'),
+            pd.Series({FLAGS_COLUMN: bytes_before.reindex(FLAG_COLUMNS).sum()}),
+        ])
+    report = pd.DataFrame({'before': bytes_before, 'after': bytes_after}).reindex(bytes_after.index)
+    report.loc['total'] = report.sum()
+    report['ratio'] = (report['before'] / report['after']).round(1)
+    return report
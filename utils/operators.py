@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+
+UNSPECIFIED_OPERATOR = 'OPÉRATEUR NON SPÉCIFIÉ'
+# Valeur brute donnée aux noms manquants avant normalisation
+MISSING_OPERATOR = 'Opérateur non spécifié'
+# Table d'alias validés (alias,canonical), complétée à partir du rapport de quasi-doublons
+ALIASES_PATH = "data/operator_aliases.csv"
+# Table de correspondance nom brut -> nom canonique déjà calculée, réutilisée d'un process à l'autre
+LOOKUP_PATH = "data/cache/operator_lookup.json"
+
+# Règles exactes, sur le nom normalisé (avant '|', sans espaces autour, en majuscules)
+EXACT_RULES = {
+    'TOTALENERGIES CHARGING SERVICES': 'TOTALENERGIES',
+    'TOTALENERGIES MARKETING FRANCE': 'TOTALENERGIES',
+    'TOTAL MARKETING FRANCE': 'TOTALENERGIES',
+    'TOTAL CHARGING SERVICES': 'TOTALENERGIES',
+    'TOTAL ÉNERGIE': 'TOTALENERGIES',
+    'ATLANTE FRANCE': 'ATLANTE',
+    'FRESHMILE SAS': 'FRESHMILE',
+    'CENTRE D\'EXPLOITATION FRESHMILE': 'FRESHMILE',
+    'BOUYGUES ENERGIES & SERVICES': 'BOUYGUES E&S',
+    'BOUYGUES ENERGIES ET SERVICES': 'BOUYGUES E&S',
+    'BOUYGUES ENERGIES SERVICES': 'BOUYGUES E&S',
+    'CHARGEPOINT': 'CHARGEPOINT',
+    'CHARGE POINT': 'CHARGEPOINT',
+    'TESLA FRANCE SARL': 'TESLA',
+    'LIDL FRANCE': 'LIDL',
+    'IZIVIA': 'IZIVIA',
+    'MOVIVE_IZIVIA': 'IZIVIA',
+    'ELECTROMAPS': 'ELECTROMAPS',
+    'WAAT - PROUDREED': 'WAAT',
+    'WAAT SAS': 'WAAT',
+    'IONITY': 'IONITY',
+    'SHELL RECHARGE': 'SHELL RECHARGE',
+    'GREENFLUX': 'GREENFLUX',
+    'ALLEGO': 'ALLEGO',
+    'DRIVECO': 'DRIVECO',
+    'VIRTA': 'VIRTA',
+    'EVBOX': 'EVBOX',
+    'SPIE CITYNETWORKS': 'SPIE',
+    'ZUNDER (GRUPO EASYCHARGER S.A)': 'ZUNDER',
+    'ALDI MARCHE COLMAR': 'ALDI',
+    'ALDI MARCHE CESTAS SARL': 'ALDI',
+    'ALDI MARCHE CAVAILLON (ALDI MARCHE)': 'ALDI',
+    'AUTORECHARGE SAS':'AUTORECHARGE',
+    'EASY CHARGE SERVICES':'EASY CHARGE',
+    'SAS E-MOTUM': 'E-MOTUM',
+    'EV MAP SAS': 'EV MAP',
+    'BP FRANCE': 'BP',
+    'BP PULSE': 'BP',
+    'ZEPHYRE SAS': 'ZEPHYRE',
+    'NORMATECH LODMI':'NORMATECH',
+    'MOBILIZE FAST CHARGE NETWORK FRANCE': 'MOBILIZE FAST CHARGE',
+    'SAP LABS FRANCE SAS': 'SAP LABS',
+    'SAP LABS FRANCE': 'SAP LABS',
+    'CHARGEPOINT AUSTRIA GMBH': 'CHARGEPOINT',
+    'SYNDICAT DÉPARTEMENTAL ÉNERGIE AUBE (SDEA)': 'SDEA',
+    "SYNDICAT MIXTE DÉPARTEMENTAL D'ÉNERGIES DU CALVADOS (SDEC ÉNERGIE)": 'SDEC ÉNERGIE',
+    "SYNDICAT INTERCOMMUNAL D'ELECTRICITÉ DE CÔTE D'OR (SICECO21)": 'SICECO21',
+    "SYNDICAT DÉPARTEMENTAL D'ÉNERGIE DE LA HAUTE-GARONNE (SDEHG)": 'SDEHG',
+    "SYNDICAT D'ENERGIE ET DES DÉCHETS DE LA MARNE (SDED52)": 'SDED52',
+    'MORBIHAN ÉNERGIES': 'MORBIHAN ÉNERGIES',
+    'NAN': UNSPECIFIED_OPERATOR,
+    'NON CONCERNÉ': UNSPECIFIED_OPERATOR,
+    'PAS DITINERANCE': UNSPECIFIED_OPERATOR,
+}
+# Règles par préfixe (le plus long l'emporte) puis par expression régulière, dans l'ordre
+PREFIX_RULES = {
+    'ALDI MARCHE ': 'ALDI',
+}
+REGEX_RULES = [
+    (r"^BOUYGUES ENERGIES?\s*(&|ET)?\s*SERVICES\b", 'BOUYGUES E&S'),
+]
+
+# Formes juridiques et mots vides ignorés pour repérer les quasi-doublons
+_LEGAL_WORDS = {'SA', 'SAS', 'SASU', 'SARL', 'EURL', 'SCA', 'GMBH', 'FRANCE', 'GROUPE', 'GROUP', 'ET', 'DE', 'DU', 'DES', 'LA', 'LE', 'LES'}
+
+
+def normalize_name(raw):
+    # Même normalisation que l'ancien .str.split('|').str[0].str.strip().str.upper()
+    return raw.split('|')[0].strip().upper()
+
+
+def name_fingerprint(name):
+    # Clé de regroupement : sans accents ni ponctuation, sans formes juridiques, mots triés
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    words = set(re.sub(r"[^A-Z0-9]+", ' ', ascii_name.upper()).split()) - _LEGAL_WORDS
+    return ' '.join(sorted(words))
+
+
+def load_aliases(path=ALIASES_PATH):
+    if not os.path.exists(path):
+        return {}
+    aliases = pd.read_csv(path, dtype=str).dropna()
+    return dict(zip(aliases['alias'].map(normalize_name), aliases['canonical']))
+
+
+def learn_aliases(pairs, path=ALIASES_PATH):
+    # Ajoute des alias validés (par ex. issus de near_duplicates) à la table persistée
+    aliases = load_aliases(path)
+    aliases.update({normalize_name(alias): canonical for alias, canonical in pairs})
+    pd.DataFrame({'alias': list(aliases), 'canonical': list(aliases.values())}).to_csv(path, index=False)
+    get_operator_canonicalizer.cache_clear()
+
+
+class OperatorCanonicalizer:
+    # Moteur de normalisation des noms d'opérateurs : travaille sur les valeurs distinctes
+    # (quelques milliers) puis redéploie le résultat sur les lignes par leurs codes entiers
+
+    def __init__(self, exact=EXACT_RULES, prefixes=PREFIX_RULES, regexes=REGEX_RULES, aliases=None):
+        self.exact = dict(exact)
+        self.aliases = load_aliases() if aliases is None else dict(aliases)
+        # préfixes du plus long au plus court, expressions compilées une fois
+        self.prefixes = sorted(prefixes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.regexes = [(re.compile(pattern), canonical) for pattern, canonical in regexes]
+        rules = [sorted(self.exact.items()), sorted(self.aliases.items()), self.prefixes, list(regexes)]
+        self.fingerprint = hashlib.blake2b(json.dumps(rules).encode(), digest_size=8).hexdigest()
+        self.lookup = {}
+        self.matched = {}
+
+    def canonical_name(self, raw):
+        # Renvoie (nom canonique, règle appliquée ou None)
+        name = normalize_name(raw)
+        if name in self.exact:
+            return self.exact[name], 'exact'
+        if name in self.aliases:
+            return self.aliases[name], 'alias'
+        for prefix, canonical in self.prefixes:
+            if name.startswith(prefix):
+                return canonical, 'prefix'
+        for pattern, canonical in self.regexes:
+            if pattern.search(name):
+                return canonical, 'regex'
+        return name, None
+
+    def _resolve(self, uniques):
+        for raw in uniques:
+            if raw not in self.lookup:
+                self.lookup[raw], self.matched[raw] = self.canonical_name(raw)
+
+    def canonicalize(self, series):
+        # factorize -> une normalisation par valeur distincte -> take par les codes
+        values = series.fillna(MISSING_OPERATOR)
+        codes, uniques = pd.factorize(values)
+        self._resolve(uniques)
+        canonical = np.array([self.lookup[raw] for raw in uniques], dtype=object)
+        return pd.Series(canonical[codes], index=series.index, name=series.name, dtype=series.dtype)
+
+    def load(self, path=LOOKUP_PATH):
+        # Table précalculée, ignorée si les règles ont changé depuis son écriture
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get('fingerprint') == self.fingerprint:
+            self.lookup.update(stored['lookup'])
+            self.matched.update(stored['matched'])
+
+    def save(self, names, path=LOOKUP_PATH):
+        # Seuls les noms bruts `names` sont écrits : la table ne grossit pas d'un dataset à l'autre
+        self._resolve(names)
+        lookup = {raw: self.lookup[raw] for raw in names}
+        matched = {raw: self.matched[raw] for raw in names}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'lookup': lookup, 'matched': matched}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=None)
+def get_operator_canonicalizer():
+    # Un moteur par process, initialisé depuis la table persistée
+    engine = OperatorCanonicalizer()
+    engine.load()
+    return engine
+
+
+def canonicalize_operators(series):
+    # Sans écriture sur disque : la table est sauvegardée une fois le dataset préparé (save_operator_lookup)
+    return get_operator_canonicalizer().canonicalize(series)
+
+
+def operator_names(series):
+    # Noms bruts distincts, clés de la table de correspondance
+    return series.fillna(MISSING_OPERATOR).unique().tolist()
+
+
+def save_operator_lookup(names, path=LOOKUP_PATH):
+    # Appelée par le seul process principal, après la fusion des blocs : les workers ne l'écrivent jamais
+    get_operator_canonicalizer().save(sorted(set(names)), path)
+
+
+def near_duplicates(names, counts=None):
+    # Noms canoniques distincts qui ne diffèrent que par la casse, les accents, la ponctuation ou
+    # la forme juridique. Proposition de nom canonique : la variante la plus fréquente.
+    names = pd.Series(list(names), dtype=object)
+    counts = pd.Series(1 if counts is None else list(counts), index=names.index)
+    groups = pd.DataFrame({'name': names, 'count': counts, 'key': names.map(name_fingerprint)})
+    groups = groups[groups['key'] != '']
+    groups = groups[groups.groupby('key')['name'].transform('nunique') > 1]
+    if groups.empty:
+        return pd.DataFrame(columns=['Variant', 'Terminals', 'Suggested canonical name'])
+    groups = groups.sort_values(['key', 'count'], ascending=[True, False], kind='stable')
+    groups['suggested'] = groups.groupby('key')['name'].transform('first')
+    return groups.rename(columns={'name': 'Variant', 'count': 'Terminals', 'suggested': 'Suggested canonical name'})[
+        ['Variant', 'Terminals', 'Suggested canonical name']
+    ].reset_index(drop=True)
@@ -0,0 +1,103 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from utils.io import GEOJSON_PATH, CHUNK_ROWS
+from utils.prep import prepare_data, colonnes_a_garder
+from utils.schema import read_dtypes
+from utils.spatial import get_departement_index
+from utils.operators import get_operator_canonicalizer
+
+# Nombre de process de préparation : DATAVIZ_PREP_WORKERS=0 utilise tous les cœurs, 1 (défaut) reste en série
+PREP_WORKERS = int(os.environ.get('DATAVIZ_PREP_WORKERS', '1')) or os.cpu_count()
+# Taille des lectures lors du découpage du fichier (octets)
+SCAN_BYTES = 64 * 1024 * 1024
+
+
+class BlockMismatch(Exception):
+    # Un bloc n'a pas le nombre de lignes attendu (guillemet isolé, ligne blanche non standard...) :
+    # le découpage ne reproduit pas celui de read_csv, la préparation repasse en série
+    pass
+
+
+def row_blocks(path, rows_per_block=CHUNK_ROWS):
+    # Découpe le fichier en plages d'octets de `rows_per_block` lignes de données, comme les blocs
+    # de iter_data. Une fin de ligne n'en est une qu'en dehors d'un champ entre guillemets
+    # (nombre pair de guillemets depuis le début du fichier) ; les lignes vides sont ignorées comme par read_csv.
+    header_end, blocks = None, []
+    block_start, block_rows, first_row = 0, 0, 0
+    offset, quotes, line_start, last_byte, data = 0, 0, 0, 0, b''
+    with open(path, 'rb') as f:
+        while chunk := f.read(SCAN_BYTES):
+            data = chunk
+            buffer = np.frombuffer(data, dtype=np.uint8)
+            newlines = np.flatnonzero(buffer == ord('\n'))
+            quote_positions = np.flatnonzero(buffer == ord('"'))
+            parity = (quotes + np.searchsorted(quote_positions, newlines)) % 2
+            ends = offset + newlines[parity == 0]
+            quotes += len(quote_positions)
+            offset += len(data)
+            if len(ends):
+                # ligne vide : rien, ou seulement '\r', avant la fin de ligne
+                lengths = ends - np.r_[line_start, ends[:-1] + 1]
+                previous = ends - 1 - (offset - len(data))
+                before = np.where(previous >= 0, buffer[previous.clip(min=0)], last_byte)
+                ends = ends[(lengths > 1) | ((lengths == 1) & (before != ord('\r')))]
+                line_start = int(offset - len(data) + newlines[parity == 0][-1]) + 1
+            last_byte = buffer[-1]
+            if header_end is None and len(ends):
+                header_end = block_start = int(ends[0]) + 1
+                ends = ends[1:]
+            # fin de bloc toutes les `rows_per_block` lignes de données
+            for cut in ends[rows_per_block - block_rows - 1::rows_per_block]:
+                blocks.append((block_start, int(cut) + 1, first_row, rows_per_block))
+                block_start, first_row = int(cut) + 1, first_row + rows_per_block
+            block_rows = (block_rows + len(ends)) % rows_per_block
+    # dernière ligne sans fin de ligne : comptée si elle n'est pas vide
+    tail = data[line_start - (offset - len(data)):] if line_start >= offset - len(data) else None
+    if tail is None:
+        block_rows = -1  # ligne plus longue qu'une lecture : guillemet isolé, le bloc sera refusé
+    elif tail.strip(b'\r'):
+        block_rows += 1
+    if header_end is not None and block_rows:
+        blocks.append((block_start, offset, first_row, block_rows))
+    return header_end, blocks
+
+
+def _init_worker(geojson_path):
+    # Index des départements et moteur de noms d'opérateurs construits une fois par process
+    get_departement_index(geojson_path)
+    get_operator_canonicalizer()
+
+
+def _prepare_block(csv_path, geojson_path, header_end, block):
+    start, end, first_row, expected_rows = block
+    with open(csv_path, 'rb') as f:
+        header = f.read(header_end)
+        f.seek(start)
+        body = f.read(end - start)
+    text = (header + body).decode('utf-8', errors='ignore')
+    chunk = pd.read_csv(io.StringIO(text), usecols=colonnes_a_garder, dtype=read_dtypes(), low_memory=False)
+    if len(chunk) != expected_rows:
+        raise BlockMismatch(f"rows {first_row}: expected {expected_rows}, parsed {len(chunk)}")
+    # même index que les blocs de iter_data (numéro de ligne dans le fichier)
+    chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+    return prepare_data(chunk, geojson_path=geojson_path)
+
+
+def prepare_parallel(csv_path, geojson_path=GEOJSON_PATH, workers=PREP_WORKERS):
+    # Blocs préparés (lecture, typage, noms d'opérateurs, département) dans un pool de process,
+    # renvoyés dans l'ordre du fichier : mêmes blocs, donc même résultat, qu'en série
+    header_end, blocks = row_blocks(csv_path)
+    if header_end is None or not blocks:
+        return None
+    _init_worker(geojson_path)  # avec fork, les workers héritent de l'index déjà construit
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(geojson_path,)) as pool:
+        futures = [pool.submit(_prepare_block, csv_path, geojson_path, header_end, block) for block in blocks]
+        try:
+            return [future.result() for future in futures]
+        except BlockMismatch:
+            for future in futures:
+                future.cancel()
+            return None
@@ -0,0 +1,69 @@
+import os
+import json
+import warnings
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+# Budget par graphique Altair : spec JSON + données envoyées au navigateur (octets)
+CHART_PAYLOAD_BUDGET = 32 * 1024
+# DATAVIZ_PAYLOAD_STRICT=1 (smoke tests, benchmarks) : un dépassement lève une erreur au lieu d'un avertissement
+PAYLOAD_STRICT = os.environ.get('DATAVIZ_PAYLOAD_STRICT') == '1'
+
+
+class PayloadBudgetExceeded(Exception):
+    pass
+
+
+def _encoded_fields(node, fields):
+    # Champs lus par l'encodage (axes, couleur, offset, tooltip...)
+    if isinstance(node, dict):
+        if isinstance(node.get('field'), str):
+            fields.add(node['field'])
+        for value in node.values():
+            _encoded_fields(value, fields)
+    elif isinstance(node, list):
+        for value in node:
+            _encoded_fields(value, fields)
+    return fields
+
+
+def compact_chart(chart):
+    # Données du graphique réduites aux colonnes encodées, entiers au plus petit type :
+    # même rendu, moins d'octets (les données partent en Arrow, la spec en JSON)
+    data = chart.data
+    # spec sans les lignes : l'inférence des types (raccourcis 'col' sans ':N') n'a besoin que des dtypes
+    spec = chart.copy(deep=False)
+    if isinstance(data, pd.DataFrame):
+        spec.data = data.head(0)
+    spec = spec.to_dict()
+    if isinstance(data, pd.DataFrame):
+        fields = _encoded_fields(spec.get('encoding', {}), set())
+        data = data[[col for col in data.columns if col in fields]].reset_index(drop=True)
+        for col in data.columns:
+            if data[col].dtype.kind in 'iu':
+                data[col] = pd.to_numeric(data[col], downcast='integer' if data[col].min() < 0 else 'unsigned')
+        chart = chart.copy(deep=False)
+        chart.data = data
+    return chart, len(json.dumps(spec)) + data_bytes(data)
+
+
+def data_bytes(data):
+    if not isinstance(data, pd.DataFrame):
+        return 0
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def display_chart(chart, budget=CHART_PAYLOAD_BUDGET):
+    # st.altair_chart avec données compactées et budget d'octets vérifié
+    chart, size = compact_chart(chart)
+    if size > budget:
+        message = f"chart payload {size:,} bytes exceeds the {budget:,} bytes budget"
+        if PAYLOAD_STRICT:
+            raise PayloadBudgetExceeded(message)
+        warnings.warn(message, stacklevel=2)
+    st.altair_chart(chart, use_container_width=True)
@@ -0,0 +1,210 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Instrumentation des sections : DATAVIZ_PERF=1 l'active, sinon le décorateur `timed` renvoie
+# la fonction telle quelle.
+# DATAVIZ_PERF=alloc mesure aussi les allocations (tracemalloc, qui ralentit nettement le process).
+PERF_ENABLED = os.environ.get('DATAVIZ_PERF') in ('1', 'alloc')
+PERF_TRACE_ALLOC = os.environ.get('DATAVIZ_PERF') == 'alloc'
+# La taille des messages envoyés au navigateur (payload_bytes) passe par l'attribut privé
+# ScriptRunContext._enqueue de Streamlit : s'il disparaît, elle n'est plus mesurée (reste à 0).
+# Export optionnel : une ligne JSON par section exécutée, et métriques cumulées au format texte Prometheus
+PERF_LOG_PATH = os.environ.get('DATAVIZ_PERF_LOG')
+PERF_PROMETHEUS_PATH = os.environ.get('DATAVIZ_PERF_PROMETHEUS')
+# Nombre de reruns gardés pour le panneau
+PERF_HISTORY = 20
+METRICS = ['wall_seconds', 'cpu_seconds', 'alloc_bytes', 'payload_bytes']
+COUNTER_METRICS = ['wall_seconds', 'cpu_seconds', 'payload_bytes']
+# Statistiques des caches de résultats (ResultCache.stats) : compteurs cumulés, puis jauges
+CACHE_COUNTERS = ['hits', 'misses', 'evictions']
+CACHE_GAUGES = ['entries', 'bytes', 'max_bytes']
+
+_local = threading.local()
+
+if PERF_TRACE_ALLOC and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+class PerfRegistry:
+    # Cumuls par section pour tout le process (sessions confondues), exportés au format Prometheus
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+
+    def add(self, record):
+        with self.lock:
+            totals = self.totals.setdefault(record['section'], dict.fromkeys(['count'] + METRICS, 0))
+            totals['count'] += 1
+            for metric in COUNTER_METRICS:
+                totals[metric] += record[metric]
+            # delta d'allocation signé : exporté comme jauge (dernière valeur), pas comme compteur
+            totals['alloc_bytes'] = record['alloc_bytes']
+
+    def prometheus_text(self, caches=None):
+        # `caches` : {nom: ResultCache} partagés du process, exportés avec les sections
+        with self.lock:
+            totals = {name: dict(values) for name, values in self.totals.items()}
+        lines = []
+        for metric in COUNTER_METRICS:
+            lines.append(f"# TYPE dataviz_section_{metric}_total counter")
+            for name, values in sorted(totals.items()):
+                lines.append(f'dataviz_section_{metric}_total{{section="{name}"}} {values[metric]}')
+        lines.append("# TYPE dataviz_section_alloc_bytes gauge")
+        for name, values in sorted(totals.items()):
+            if values['alloc_bytes'] is not None:
+                lines.append(f'dataviz_section_alloc_bytes{{section="{name}"}} {values["alloc_bytes"]}')
+        lines.append("# TYPE dataviz_section_runs_total counter")
+        for name, values in sorted(totals.items()):
+            lines.append(f'dataviz_section_runs_total{{section="{name}"}} {values["count"]}')
+        stats = {name: cache.stats() for name, cache in sorted((caches or {}).items())}
+        for metric in CACHE_COUNTERS:
+            lines.append(f"# TYPE dataviz_cache_{metric}_total counter")
+            for name, values in stats.items():
+                lines.append(f'dataviz_cache_{metric}_total{{cache="{name}"}} {values[metric]}')
+        for metric in CACHE_GAUGES:
+            lines.append(f"# TYPE dataviz_cache_{metric} gauge")
+            for name, values in stats.items():
+                lines.append(f'dataviz_cache_{metric}{{cache="{name}"}} {values[metric]}')
+        return "\n".join(lines) + "\n"
+
+
+@st.cache_resource
+def get_perf_registry():
+    return PerfRegistry()
+
+
+def _count_payload(ctx):
+    # Taille des messages envoyés au navigateur, attribuée aux sections ouvertes du thread
+    if not hasattr(ctx, '_enqueue') or getattr(ctx._enqueue, 'perf_wrapped', False):
+        return
+    enqueue = ctx._enqueue
+
+    def counting_enqueue(msg):
+        for record in getattr(_local, 'stack', ()):
+            record['payload_bytes'] += msg.ByteSize()
+        enqueue(msg)
+
+    counting_enqueue.perf_wrapped = True
+    ctx._enqueue = counting_enqueue
+
+
+def _session_log():
+    # Reruns de la session : liste de listes d'enregistrements, la dernière est le rerun courant
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    _count_payload(ctx)
+    if '_perf_reruns' not in st.session_state:
+        st.session_state['_perf_reruns'] = [[]]
+    return st.session_state['_perf_reruns']
+
+
+def start_rerun():
+    # Début d'une exécution complète du script : nouveau rerun dans l'historique de la session
+    if not PERF_ENABLED:
+        return
+    reruns = _session_log()
+    if reruns is not None:
+        st.session_state['_perf_rerun'] = st.session_state.get('_perf_rerun', 0) + 1
+        reruns.append([])
+        del reruns[:-PERF_HISTORY]
+
+
+@contextlib.contextmanager
+def _measure(name):
+    reruns = _session_log()
+    stack = _local.__dict__.setdefault('stack', [])
+    record = {'section': name, 'payload_bytes': 0}
+    stack.append(record)
+    alloc_start = tracemalloc.get_traced_memory()[0] if PERF_TRACE_ALLOC else None
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = time.perf_counter() - wall_start
+        record['cpu_seconds'] = time.thread_time() - cpu_start
+        record['alloc_bytes'] = tracemalloc.get_traced_memory()[0] - alloc_start if PERF_TRACE_ALLOC else None
+        stack.pop()
+        _store(record, reruns)
+
+
+def _store(record, reruns):
+    ctx = get_script_run_ctx()
+    record['time'] = time.time()
+    record['session'] = ctx.session_id if ctx else None
+    if reruns is not None:
+        record['rerun'] = st.session_state.get('_perf_rerun', 0)
+        reruns[-1].append(record)
+    get_perf_registry().add(record)
+    if PERF_LOG_PATH:
+        with open(PERF_LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def timed(func=None, name=None):
+    # Décorateur : @timed ou @timed(name='...'). À placer sous @st.fragment pour mesurer aussi
+    # les reruns du fragment, au-dessus de @st.cache_* pour mesurer l'appel tel que vu par la page.
+    if func is None:
+        return functools.partial(timed, name=name)
+    if not PERF_ENABLED:
+        return func
+    label = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _measure(label):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def records_frame(records):
+    return pd.DataFrame(records, columns=['rerun', 'section'] + METRICS)
+
+
+def jsonl_text(reruns):
+    return "".join(json.dumps(record) + "\n" for records in reruns for record in records)
+
+
+def display_perf_panel(caches=None):
+    # Panneau "Performance" : n'existe que si l'instrumentation est active.
+    # `caches` : {nom: ResultCache} dont les succès / échecs / évictions sont affichés et exportés
+    if not PERF_ENABLED:
+        return
+    reruns = _session_log() or [[]]
+    registry = get_perf_registry()
+    prometheus = registry.prometheus_text(caches)
+    if PERF_PROMETHEUS_PATH:
+        tmp_path = f"{PERF_PROMETHEUS_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(prometheus)
+        os.replace(tmp_path, PERF_PROMETHEUS_PATH)
+
+    with st.sidebar.expander("Performance", expanded=False):
+        current = records_frame(reruns[-1])
+        st.caption(f"Rerun {st.session_state.get('_perf_rerun', 0)}: {len(current)} sections, "
+                   f"{current['payload_bytes'].sum() / 1024:,.0f} KiB sent")
+        st.dataframe(
+            current.drop(columns='rerun').sort_values('wall_seconds', ascending=False),
+            hide_index=True, use_container_width=True,
+        )
+        history = records_frame([record for records in reruns for record in records])
+        if not history.empty:
+            st.caption("Mean over the last reruns")
+            st.dataframe(history.groupby('section')[METRICS].mean().sort_values('wall_seconds', ascending=False),
+                         use_container_width=True)
+        if caches:
+            st.caption("Shared result caches (all sessions)")
+            st.dataframe(pd.DataFrame.from_dict({name: cache.stats() for name, cache in caches.items()}, orient='index'),
+                         use_container_width=True)
+        st.download_button("Export JSON lines", jsonl_text(reruns), file_name="perf.jsonl", mime="application/json")
+        st.download_button("Export Prometheus", prometheus, file_name="perf.prom", mime="text/plain")
@@ -1,121 +1,69 @@
+import numpy as np
 import pandas as pd
-import geopandas as gpd
+from utils.io import GEOJSON_PATH
+from utils.schema import apply_schema, COERCED_COLUMNS
+from utils.spatial import get_departement_index
+from utils.operators import canonicalize_operators, operator_names
+from utils.memory import frame_bytes, pack_masks
+from utils.validation import validate, rule_counts, RULE_NAMES
 
-def prepare_data(df):
-    colonnes_a_garder = [
-        'nom_operateur', 'adresse_station', 'consolidated_longitude', 
-        'consolidated_latitude', 'puissance_nominale', 'prise_type_ef', 
-        'prise_type_2', 'prise_type_combo_ccs', 'prise_type_chademo', 
-        'prise_type_autre', 'paiement_acte', 'paiement_cb', 
-        'paiement_autre', 'condition_acces', 'reservation', 'date_mise_en_service','nbre_pdc'
-    ]
-    
-    df_prepared = df[colonnes_a_garder].copy()
+colonnes_a_garder = [
+    'nom_operateur', 'adresse_station', 'consolidated_longitude', 
+    'consolidated_latitude', 'puissance_nominale', 'prise_type_ef', 
+    'prise_type_2', 'prise_type_combo_ccs', 'prise_type_chademo', 
+    'prise_type_autre', 'paiement_acte', 'paiement_cb', 
+    'paiement_autre', 'condition_acces', 'reservation', 'date_mise_en_service','nbre_pdc'
+]
 
-    df_prepared['date_mise_en_service'] = pd.to_datetime(df_prepared['date_mise_en_service'], errors='coerce')
-    df_prepared['puissance_nominale'] = pd.to_numeric(df_prepared['puissance_nominale'], errors='coerce')
+def prepare_data(df, geojson_path=GEOJSON_PATH, with_row_flags=False):
+    df_prepared = df[colonnes_a_garder].copy()
 
-    cols_to_normalize = [
-        'prise_type_ef', 'prise_type_2', 'prise_type_combo_ccs', 
-        'prise_type_chademo', 'prise_type_autre',
-        'paiement_acte', 'paiement_cb', 'paiement_autre'
-    ]
-    true_values = ['true', '1']
-    for col in cols_to_normalize:
-        if col in df_prepared.columns:
-            df_prepared[col] = df_prepared[col].str.lower().isin(true_values)
+    # Types, dates et booléens (prise_type_*, paiement_*) sont convertis d'après utils.schema.SCHEMA
+    df_prepared, coercion_report, coercion_failed = apply_schema(df_prepared)
 
+    # Normalisation des noms d'opérateurs sur les valeurs distinctes puis redéploiement par codes (utils.operators)
+    df_prepared['nom_operateur'] = canonicalize_operators(df_prepared['nom_operateur'])
 
-    df_prepared['nom_operateur'].fillna('Opérateur non spécifié', inplace=True)
-    df_prepared['paiement_cb'].fillna(False, inplace=True)
-    df_prepared['paiement_autre'].fillna(False, inplace=True)
-    df_prepared['paiement_acte'].fillna(False, inplace=True)
-    
+    # Contrôles vectorisés avant la jointure (utils.validation) : coordonnées nulles, inversées ou hors de France,
+    # puissances saisies en W ; seules les positions plausibles passent au test des polygones
+    df_prepared, plausible, rule_masks = validate(df_prepared)
+    validation_report = rule_counts(rule_masks)
 
-    df_prepared['nom_operateur'] = df_prepared['nom_operateur'].str.split('|').str[0].str.strip().str.upper()
-    mapping_operateurs = {
-        'TOTALENERGIES CHARGING SERVICES': 'TOTALENERGIES',
-        'TOTALENERGIES MARKETING FRANCE': 'TOTALENERGIES',
-        'TOTAL MARKETING FRANCE': 'TOTALENERGIES',
-        'TOTAL CHARGING SERVICES': 'TOTALENERGIES',
-        'TOTAL ÉNERGIE': 'TOTALENERGIES',
-        'ATLANTE FRANCE': 'ATLANTE',
-        'FRESHMILE SAS': 'FRESHMILE',
-        'CENTRE D\'EXPLOITATION FRESHMILE': 'FRESHMILE',
-        'BOUYGUES ENERGIES & SERVICES': 'BOUYGUES E&S',
-        'BOUYGUES ENERGIES ET SERVICES': 'BOUYGUES E&S',
-        'BOUYGUES ENERGIES SERVICES': 'BOUYGUES E&S',
-        'CHARGEPOINT': 'CHARGEPOINT',
-        'CHARGE POINT': 'CHARGEPOINT',
-        'TESLA FRANCE SARL': 'TESLA',
-        'LIDL FRANCE': 'LIDL',
-        'IZIVIA': 'IZIVIA',
-        'MOVIVE_IZIVIA': 'IZIVIA',
-        'ELECTROMAPS': 'ELECTROMAPS',
-        'WAAT - PROUDREED': 'WAAT',
-        'WAAT SAS': 'WAAT',
-        'IONITY': 'IONITY',
-        'SHELL RECHARGE': 'SHELL RECHARGE',
-        'GREENFLUX': 'GREENFLUX',
-        'ALLEGO': 'ALLEGO',
-        'DRIVECO': 'DRIVECO',
-        'VIRTA': 'VIRTA',
-        'EVBOX': 'EVBOX',
-        'SPIE CITYNETWORKS': 'SPIE',
-        'SPIE CITYNETWORKS': 'SPIE',
-        'ZUNDER (GRUPO EASYCHARGER S.A)': 'ZUNDER',
-        'ALDI MARCHE COLMAR': 'ALDI',
-        'ALDI MARCHE CESTAS SARL': 'ALDI',
-        'ALDI MARCHE CAVAILLON (ALDI MARCHE)': 'ALDI',
-        'AUTORECHARGE SAS':'AUTORECHARGE',
-        'EASY CHARGE SERVICES':'EASY CHARGE',
-        'SAS E-MOTUM': 'E-MOTUM',
-        'EV MAP SAS': 'EV MAP',
-        'BP FRANCE': 'BP',
-        'BP PULSE': 'BP',
-        'ZEPHYRE SAS': 'ZEPHYRE',
-        'NORMATECH LODMI':'NORMATECH',
-        'MOBILIZE FAST CHARGE NETWORK FRANCE': 'MOBILIZE FAST CHARGE',
-        'SAP LABS FRANCE SAS': 'SAP LABS',
-        'SAP LABS FRANCE': 'SAP LABS',
-        'CHARGEPOINT AUSTRIA GMBH': 'CHARGEPOINT', 
-        'SYNDICAT DÉPARTEMENTAL ÉNERGIE AUBE (SDEA)': 'SDEA',
-        "SYNDICAT MIXTE DÉPARTEMENTAL D'ÉNERGIES DU CALVADOS (SDEC ÉNERGIE)": 'SDEC ÉNERGIE',
-        "SYNDICAT INTERCOMMUNAL D'ELECTRICITÉ DE CÔTE D'OR (SICECO21)": 'SICECO21',
-        "SYNDICAT DÉPARTEMENTAL D'ÉNERGIE DE LA HAUTE-GARONNE (SDEHG)": 'SDEHG',
-        "SYNDICAT D'ENERGIE ET DES DÉCHETS DE LA MARNE (SDED52)": 'SDED52',
-        'MORBIHAN ÉNERGIES': 'MORBIHAN ÉNERGIES',
-        'NAN': 'OPÉRATEUR NON SPÉCIFIÉ',
-        'NON CONCERNÉ': 'OPÉRATEUR NON SPÉCIFIÉ',
-        'PAS DITINERANCE': 'OPÉRATEUR NON SPÉCIFIÉ',
-    }
-    df_prepared['nom_operateur'] = df_prepared['nom_operateur'].replace(mapping_operateurs)
-    
+    # Catégorie de puissance calculée une seule fois ici et réutilisée par tous les graphiques
+    df_prepared['categorie_puissance'] = categorize_power(df_prepared['puissance_nominale'])
 
     # ------------------------------------- JOINTURE SPATIALE -----------------------------------
-    gdf_departements = gpd.read_file("data/departements-version-simplifiee.geojson")
-    df_bornes_gps = df_prepared.dropna(subset=['consolidated_longitude', 'consolidated_latitude']).copy()
+    # Équivalent de gpd.sjoin(..., predicate='within') via l'index des départements (utils.spatial)
+    index_departements = get_departement_index(geojson_path)
+    df_bornes_gps = df_prepared[plausible]
 
-    gdf_bornes = gpd.GeoDataFrame(
-        df_bornes_gps,
-        geometry=gpd.points_from_xy(df_bornes_gps.consolidated_longitude, df_bornes_gps.consolidated_latitude),
-        crs="EPSG:4326"
-    )
-
-    gdf_final = gpd.sjoin(gdf_bornes, gdf_departements, how="inner", predicate='within')
-    gdf_final.rename(columns={'code': 'departement'}, inplace=True)
-    df_final = pd.DataFrame(gdf_final.drop(columns=['geometry', 'index_right', 'nom']))
+    rows, polys = index_departements.query(df_bornes_gps['consolidated_longitude'], df_bornes_gps['consolidated_latitude'])
+    df_final = df_bornes_gps.iloc[rows].copy()
+    df_final['departement'] = index_departements.codes[polys]
+    df_final.attrs['coercion_report'] = coercion_report
+    df_final.attrs['validation_report'] = validation_report
+    # noms bruts du bloc : la table des opérateurs est sauvegardée après la fusion des blocs
+    df_final.attrs['operator_names'] = operator_names(df['nom_operateur'])
+    # empreinte mémoire du bloc tel que produit ici (avant transport éventuel depuis un worker, avant compactage)
+    df_final.attrs['memory_bytes'] = frame_bytes(df_final).to_dict()
 
+    if with_row_flags:
+        # drapeaux de chaque ligne d'entrée, lignes écartées comprises : l'ingestion incrémentale
+        # recompte les rapports sur les lignes présentes au lieu de les additionner
+        row_flags = pd.DataFrame({
+            'coercion': pack_masks(coercion_failed, COERCED_COLUMNS, len(df)),
+            'validation': pack_masks(rule_masks, RULE_NAMES, len(df), dtype=np.uint8),
+        }, index=df.index)
+        return df_final, row_flags
     return df_final
 
+POWER_CATEGORIES = ["Slow (< 22 kW)", "Fast (22-50 kW)", "Rapid (50-150 kW)", "Ultra-Fast (>= 150 kW)"]
+POWER_BINS = [22, 50, 150]
+
 def categorize_power(power):
-    if pd.isna(power) or power <= 0:
-        return "Slow (< 22 kW)"
-    elif power < 22:
-        return "Slow (< 22 kW)"
-    elif 22 <= power < 50:
-        return "Fast (22-50 kW)"
-    elif 50 <= power < 150:
-        return "Rapid (50-150 kW)"
-    else: 
-        return "Ultra-Fast (>= 150 kW)"
+    # Version vectorisée : bornes 22/50/150 kW, une puissance manquante ou <= 0 est classée "Slow"
+    values = power.to_numpy(dtype='float64', na_value=np.nan)
+    codes = np.searchsorted(POWER_BINS, values, side='right')
+    codes[np.isnan(values)] = 0
+    categories = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(POWER_CATEGORIES, ordered=True))
+    return pd.Series(categories, index=power.index, name='categorie_puissance')
@@ -0,0 +1,91 @@
+import itertools
+import numpy as np
+import pandas as pd
+from utils.io import DATA_PATH
+from utils.cache import load_prepared_data, dataset_fingerprint
+from utils.artifacts import artifacts_for
+from utils.filter_index import FilterIndex, selection_key
+
+# Filtres d'une requête, dans l'ordre des arguments de FilterIndex.resolve
+QUERY_FILTERS = ['operateur', 'acces', 'prise', 'paiements', 'puissance', 'pdc']
+QUERY_METRICS = ['count', 'pdc_sum', 'power_mean']
+
+
+class QueryEngine:
+    # Requêtes par lots hors Streamlit, avec la sémantique des filtres de la sidebar (FilterIndex) et
+    # les KPIs de compute_kpis. Les requêtes qui ne diffèrent que par l'opérateur partagent leur masque :
+    # un seul passage (bincount par code opérateur) donne les KPIs de tous les opérateurs demandés.
+
+    def __init__(self, df, index=None):
+        self.df = df
+        self.index = index if index is not None else FilterIndex(df)
+        codes, operators = pd.factorize(df['nom_operateur'])
+        # code 0 = opérateur manquant
+        self.operator_codes = codes.astype(np.int32) + 1
+        self.operator_code = {value: code + 1 for code, value in enumerate(operators)}
+        self.pdc = df['nbre_pdc'].to_numpy(dtype='float64', na_value=np.nan)
+        self.power = df['puissance_nominale'].to_numpy(dtype='float64', na_value=np.nan)
+
+    @classmethod
+    def from_dataset(cls, csv_path=DATA_PATH):
+        # Build hors ligne s'il a été produit à partir de ce CSV (index déjà calculé), sinon le dataset préparé en cache
+        version = dataset_fingerprint(csv_path)
+        artifacts = artifacts_for(version)
+        if artifacts is not None:
+            return cls(artifacts.df, artifacts.filter_index)
+        return cls(load_prepared_data(csv_path, version=version))
+
+    def _kpis(self, positions, operators):
+        # KPIs de toutes les lignes retenues (clé None) et de chaque opérateur demandé
+        pdc, power = self.pdc[positions], self.power[positions]
+        rated = ~np.isnan(power)
+        results = {None: (len(positions), np.nansum(pdc), power[rated].sum(), rated.sum())}
+        if operators:
+            codes = self.operator_codes[positions]
+            size = len(self.operator_code) + 1
+            counts = np.bincount(codes, minlength=size)
+            pdc_sums = np.bincount(codes, weights=np.nan_to_num(pdc), minlength=size)
+            power_sums = np.bincount(codes[rated], weights=power[rated], minlength=size)
+            power_counts = np.bincount(codes[rated], minlength=size)
+            for operator in operators:
+                code = self.operator_code.get(operator)
+                results[operator] = (
+                    (counts[code], pdc_sums[code], power_sums[code], power_counts[code]) if code else (0, 0.0, 0.0, 0)
+                )
+        return results
+
+    def run(self, queries):
+        # `queries` : liste de dicts {filtre: valeur} (libellés des widgets ou noms de colonnes, filtres absents = tous).
+        # Renvoie un DataFrame : une ligne par requête, ses filtres puis count / pdc_sum / power_mean.
+        keys = [selection_key(**query) for query in queries]
+        # requêtes regroupées par filtres hors opérateur
+        groups = {}
+        for key in keys:
+            groups.setdefault(key[1:], set()).add(key[0])
+        bitmaps = {}
+        kpis = {}
+        for rest, operators in groups.items():
+            parts = []
+            for name, value in zip(QUERY_FILTERS[1:], rest):
+                if value not in (None, ()):
+                    # bitmap de chaque valeur de filtre calculé une fois pour tout le lot
+                    if (name, value) not in bitmaps:
+                        bitmaps[(name, value)] = self.index.filter_bitmap(name, value)
+                    parts.append(bitmaps[(name, value)])
+            positions = self.index.combine(parts)
+            for operator, values in self._kpis(positions, operators - {None}).items():
+                kpis[(operator,) + rest] = values
+        rows = []
+        for query, key in zip(queries, keys):
+            count, pdc_sum, power_sum, power_count = kpis[key]
+            rows.append({name: query.get(name) for name in QUERY_FILTERS} | {
+                'count': int(count),
+                'pdc_sum': int(pdc_sum),
+                'power_mean': power_sum / power_count if power_count else float('nan'),
+            })
+        return pd.DataFrame(rows, columns=QUERY_FILTERS + QUERY_METRICS)
+
+    def sweep(self, **dimensions):
+        # Produit cartésien des valeurs de chaque filtre, ex. sweep(operateur=[...], prise=[...], paiements=[[...], ...])
+        names = list(dimensions)
+        return self.run([dict(zip(names, values)) for values in itertools.product(*dimensions.values())])
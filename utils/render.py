@@ -0,0 +1,48 @@
+import functools
+import sys
+import pandas as pd
+import streamlit as st
+from utils.result_cache import ResultCache
+
+# Budget mémoire des données de sections mémoïsées (octets)
+SECTION_CACHE_BYTES = 32 * 1024 * 1024
+
+
+@st.cache_resource
+def get_section_cache():
+    # Données des sections déjà calculées, partagées entre les sessions
+    return ResultCache(max_bytes=SECTION_CACHE_BYTES)
+
+
+def payload_size(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sum(payload_size(item) for item in value) + 64
+    if isinstance(value, dict):
+        return sum(payload_size(item) for item in value.values()) + 64
+    return sys.getsizeof(value)
+
+
+def section_data(name):
+    # Déclare le calcul des données d'une section et ses entrées : la source (dataset ou cube, dont la
+    # version est dans attrs['dataset_version']) puis les entrées propres à la section (valeurs de widgets...).
+    # Le résultat est mémoïsé par (section, entrées) et partagé : il ne doit pas être modifié par l'appelant.
+    def decorator(compute):
+        @functools.wraps(compute)
+        def wrapper(source, *inputs):
+            version = source.attrs.get('dataset_version')
+            if version is None:
+                return compute(source, *inputs)
+            return get_section_cache().get_or_compute(
+                version, (name,) + inputs, lambda: compute(source, *inputs), sizeof=payload_size
+            )
+        return wrapper
+    return decorator
+
+
+def seed_section_cache(version, payloads):
+    # Données de sections précalculées hors ligne (utils.build), placées sous leur clé de section_data
+    cache = get_section_cache()
+    for key, value in payloads.items():
+        cache.get_or_compute(version, key, lambda: value, sizeof=payload_size)
@@ -0,0 +1,64 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# Budget mémoire par défaut du cache des résultats de filtres (octets)
+FILTER_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class ResultCache:
+    # Cache LRU borné en octets, partagé entre toutes les sessions du serveur.
+    # Les clés sont préfixées par la version du dataset : un changement de version vide le cache.
+
+    def __init__(self, max_bytes=FILTER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def get_or_compute(self, version, key, compute, sizeof=sys.getsizeof):
+        with self._lock:
+            if version != self.version:
+                self._clear()
+                self.version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        # calcul hors verrou : les autres sessions ne sont pas bloquées
+        value = compute()
+        size = sizeof(value)
+
+        with self._lock:
+            if version != self.version or size > self.max_bytes or key in self._entries:
+                return value
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
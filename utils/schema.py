@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = "%Y-%m-%d"
+TRUE_VALUES = ['true', '1']
+FALSE_VALUES = ['false', '0']
+
+# Type attendu pour chaque colonne gardée. Le schéma pilote la lecture (dtype de read_csv)
+# puis la conversion finale, colonne par colonne :
+#   'float'   : nombre propre, parsé directement en float64 par read_csv (coordonnées consolidées)
+#   'numeric' : nombre saisi par les opérateurs, converti avec errors='coerce'
+#   'int'     : entier nullable (Int64)
+#   'bool'    : true/false/1/0, toute autre valeur donne False
+#   'date'    : date au format DATE_FORMAT
+SCHEMA = {
+    'nom_operateur': 'str',
+    'adresse_station': 'str',
+    'consolidated_longitude': 'float',
+    'consolidated_latitude': 'float',
+    'puissance_nominale': 'numeric',
+    'prise_type_ef': 'bool',
+    'prise_type_2': 'bool',
+    'prise_type_combo_ccs': 'bool',
+    'prise_type_chademo': 'bool',
+    'prise_type_autre': 'bool',
+    'paiement_acte': 'bool',
+    'paiement_cb': 'bool',
+    'paiement_autre': 'bool',
+    'condition_acces': 'str',
+    'reservation': 'str',
+    'date_mise_en_service': 'date',
+    'nbre_pdc': 'int',
+}
+# Colonnes converties : ordre des bits des drapeaux d'échec par ligne (utils.memory.pack_masks)
+COERCED_COLUMNS = [col for col, kind in SCHEMA.items() if kind != 'str']
+
+
+def read_dtypes(schema=SCHEMA):
+    # Les colonnes à convertir sont lues en category : la conversion ne porte ensuite
+    # que sur les valeurs distinctes (quelques centaines) au lieu de chaque ligne
+    read_as = {'str': str, 'float': 'float64'}
+    return {col: read_as.get(kind, 'category') for col, kind in schema.items()}
+
+
+def _to_float(values):
+    return pd.to_numeric(values, errors='coerce').astype('float64')
+
+
+def _to_int(values):
+    numbers = pd.to_numeric(values, errors='coerce')
+    # un nombre de points de charge non entier est considéré comme invalide
+    numbers = numbers.where(numbers.round() == numbers)
+    return numbers.astype('Int64')
+
+
+def _to_bool(values):
+    lowered = values.astype(str).str.strip().str.lower()
+    result = pd.Series(False, index=values.index)
+    result[lowered.isin(TRUE_VALUES)] = True
+    # ni vrai ni faux reconnu : reste à False (comme avant) mais compte comme un échec
+    failed = ~lowered.isin(TRUE_VALUES + FALSE_VALUES)
+    return result, failed
+
+
+def _to_date(values):
+    text = values.astype(str).str.strip()
+    # chemin rapide : format explicite, sans inférence
+    dates = pd.to_datetime(text, format=DATE_FORMAT, errors='coerce')
+    remaining = dates.isna()
+    if remaining.any():
+        # seules les valeurs distinctes hors format passent par le parseur générique
+        dates[remaining] = pd.to_datetime(text[remaining], format='mixed', errors='coerce')
+    return dates
+
+
+def _convert(series, kind):
+    # Convertit les catégories (valeurs distinctes) puis redéploie sur les lignes via les codes
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    categories = pd.Series(series.cat.categories, index=range(len(series.cat.categories)))
+    codes = series.cat.codes.to_numpy()
+
+    if kind == 'bool':
+        converted, failed_categories = _to_bool(categories)
+    else:
+        converter = {'float': _to_float, 'numeric': _to_float, 'int': _to_int, 'date': _to_date}[kind]
+        converted = converter(categories)
+        failed_categories = converted.isna()
+
+    # code -1 = valeur manquante dans le fichier : l'élément ajouté en fin de tableau lui sert de valeur
+    if kind == 'bool':
+        values = np.append(converted.to_numpy(dtype=bool), False)[codes]
+    else:
+        values = pd.api.extensions.take(converted.array, codes, allow_fill=True)
+    result = pd.Series(values, index=series.index, name=series.name)
+
+    failed_rows = np.append(failed_categories.to_numpy(dtype=bool), False)[codes]
+    examples = categories[failed_categories].head(5).tolist()
+    return result, failed_rows, examples
+
+
+def apply_schema(df, schema=SCHEMA):
+    # Renvoie le DataFrame typé, pour chaque colonne le nombre de lignes non vides dont la valeur
+    # n'a pas pu être convertie, et le masque de ces lignes (colonnes en échec seulement)
+    df_typed = df.copy()
+    report = {}
+    failed = {}
+    for col, kind in schema.items():
+        if col not in df_typed.columns:
+            continue
+        if kind == 'str':
+            continue
+        if kind == 'float' and df_typed[col].dtype == 'float64':
+            continue
+        df_typed[col], failed_rows, examples = _convert(df_typed[col], kind)
+        if failed_rows.any():
+            report[col] = {'failed_rows': int(failed_rows.sum()), 'examples': [str(v) for v in examples]}
+            failed[col] = failed_rows
+    return df_typed, report, failed
+
+
+def merge_reports(reports):
+    merged = {}
+    for report in reports:
+        for col, info in report.items():
+            entry = merged.setdefault(col, {'failed_rows': 0, 'examples': []})
+            entry['failed_rows'] += info['failed_rows']
+            entry['examples'] = (entry['examples'] + [v for v in info['examples'] if v not in entry['examples']])[:5]
+    return merged
+
+
+def coercion_report_frame(report):
+    rows = [
+        {'Column': col, 'Rows failing coercion': info['failed_rows'], 'Examples': ", ".join(info['examples'])}
+        for col, info in report.items()
+    ]
+    return pd.DataFrame(rows, columns=['Column', 'Rows failing coercion', 'Examples'])
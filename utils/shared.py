@@ -0,0 +1,59 @@
+import json
+import os
+import pyarrow as pa
+from utils.io import GEOJSON_PATH
+from utils.cache import CACHE_DIR, dataset_fingerprint, load_prepared_data, remove_stale
+
+# Dataset partagé en lecture seule (DATAVIZ_SHARED_DATASET=1) : un seul DataFrame par process, adossé
+# à un fichier Arrow mappé en mémoire ; les process serveurs d'une même machine partagent ses pages
+SHARED_DATASET = os.environ.get('DATAVIZ_SHARED_DATASET') == '1'
+# Clé des attrs dans les métadonnées du schéma (la même que celle du parquet écrit par pandas)
+ATTRS_KEY = b'PANDAS_ATTRS'
+
+
+def write_arrow(df, path):
+    # Fichier Arrow IPC (= Feather v2) non compressé, index et attrs compris, écrit puis renommé
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    metadata = dict(table.schema.metadata or {})
+    # NaN des flottants gardés comme valeurs et non comme nulls : ces colonnes se relisent sans copie
+    for position, name in enumerate(table.column_names):
+        if name in df.columns and df[name].dtype.kind == 'f':
+            table = table.set_column(position, name, pa.array(df[name].to_numpy(), from_pandas=False))
+    metadata[ATTRS_KEY] = json.dumps(df.attrs).encode()
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as f, pa.ipc.new_file(f, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_arrow(path):
+    # Colonnes numériques sans null : vues (lecture seule) sur le fichier mappé ; seuls les codes
+    # des catégories et les colonnes avec nulls sont matérialisés
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    df = table.to_pandas(split_blocks=True)
+    df.attrs = json.loads((table.schema.metadata or {}).get(ATTRS_KEY, b'{}'))
+    return df
+
+
+def load_shared_data(csv_path, geojson_path=GEOJSON_PATH, cache_dir=CACHE_DIR, loader=load_prepared_data):
+    # Le fichier Arrow d'une version est écrit une fois (par le premier process qui en a besoin)
+    # à partir du dataset préparé, puis seulement mappé. Le CSV n'est hashé qu'une fois : le loader
+    # reçoit la version.
+    version = dataset_fingerprint(csv_path, geojson_path)
+    path = os.path.join(cache_dir, f"prepared-{version}.arrow")
+    if not os.path.exists(path):
+        df = loader(csv_path, geojson_path, version=version)
+        os.makedirs(cache_dir, exist_ok=True)
+        write_arrow(df, path)
+        # fichiers des versions précédentes (Arrow ou parquet), quel que soit le loader
+        remove_stale(cache_dir, version)
+    df = read_arrow(path)
+    df.attrs['dataset_version'] = version
+    return df
+
+
+def dataset_view(df):
+    # Copie superficielle : aucune donnée copiée, et avec le copy-on-write de pandas une
+    # modification faite par l'appelant reste locale à sa vue
+    return df.copy(deep=False)
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+# Colonnes numériques résumées à l'ingestion (bornes des sliders, KPIs globaux)
+SKETCH_COLUMNS = ['puissance_nominale', 'nbre_pdc']
+# Compression du t-digest : ~COMPRESSION/2 centroïdes une fois compressé
+TDIGEST_COMPRESSION = 300
+# En deçà de ce nombre de valeurs distinctes, le digest garde les valeurs exactes (puissances, nombre de PDC
+# sont très discrets) et les quantiles sont ceux de pandas
+TDIGEST_EXACT_VALUES = 4096
+
+
+class TDigest:
+    # t-digest fusionnable (fonction d'échelle k1) : un bloc s'ajoute ou deux digests se fusionnent
+    # en triant les centroïdes puis en les regroupant tant qu'un groupe tient dans une unité de k
+
+    def __init__(self, means=None, weights=None, compression=TDIGEST_COMPRESSION, exact=True):
+        self.compression = compression
+        self.means = np.asarray([] if means is None else means, dtype='float64')
+        self.weights = np.asarray([] if weights is None else weights, dtype='float64')
+        # exact : chaque centroïde est une valeur distincte avec son nombre d'occurrences
+        self.exact = exact
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _compress(self, means, weights, exact):
+        if exact:
+            # valeurs identiques regroupées : reste exact tant qu'il y a peu de valeurs distinctes
+            means, codes = np.unique(means, return_inverse=True)
+            weights = np.bincount(codes, weights=weights, minlength=len(means))
+            if len(means) <= TDIGEST_EXACT_VALUES:
+                return means, weights, True
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        if total == 0:
+            return np.empty(0), np.empty(0), exact
+        # position de chaque centroïde dans la distribution, puis numéro de groupe = partie entière de k(q)
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        groups = np.floor(k - k[0]).astype('int64')
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        group_weights = np.add.reduceat(weights, starts)
+        group_means = np.add.reduceat(means * weights, starts) / group_weights
+        return group_means, group_weights, False
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.means, self.weights, self.exact = self._compress(
+                np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]), self.exact
+            )
+        return self
+
+    def merge(self, other):
+        means, weights, exact = self._compress(
+            np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]),
+            self.exact and other.exact,
+        )
+        return TDigest(means, weights, compression=self.compression, exact=exact)
+
+    def quantile(self, q):
+        if not len(self.means):
+            return float('nan')
+        if self.exact:
+            # interpolation linéaire entre rangs, comme Series.quantile
+            rank = (self.count - 1) * q
+            below = np.floor(rank)
+            positions = np.searchsorted(np.cumsum(self.weights), [below, below + 1], side='right')
+            lower, upper = self.means[positions.clip(max=len(self.means) - 1)]
+            return float(lower + (rank - below) * (upper - lower))
+        # interpolation linéaire entre les centres des centroïdes
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.count, centers, self.means))
+
+    def to_dict(self):
+        return {'means': self.means.tolist(), 'weights': self.weights.tolist(), 'compression': self.compression, 'exact': self.exact}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['means'], data['weights'], compression=data['compression'], exact=data['exact'])
+
+
+class ColumnSummary:
+    # count / sum / min / max d'une colonne (valeurs non manquantes) et son t-digest : tout est fusionnable
+
+    def __init__(self, count=0, total=0.0, minimum=float('inf'), maximum=float('-inf'), digest=None):
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+        self.digest = digest if digest is not None else TDigest()
+
+    @classmethod
+    def of(cls, series):
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return cls()
+        return cls(len(values), float(values.sum()), float(values.min()), float(values.max()), TDigest().update(values))
+
+    def merge(self, other):
+        return ColumnSummary(
+            self.count + other.count, self.total + other.total,
+            min(self.minimum, other.minimum), max(self.maximum, other.maximum), self.digest.merge(other.digest),
+        )
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float('nan')
+
+    def quantile(self, q):
+        # bornée par le min / max exacts
+        return min(max(self.digest.quantile(q), self.minimum), self.maximum) if self.count else float('nan')
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.total, 'min': self.minimum, 'max': self.maximum, 'digest': self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['count'], data['sum'], data['min'], data['max'], TDigest.from_dict(data['digest']))
+
+
+def summarize(df, columns=SKETCH_COLUMNS):
+    # Résumé d'un bloc : nombre de lignes et résumé de chaque colonne numérique
+    return {'rows': len(df), 'columns': {col: ColumnSummary.of(df[col]) for col in columns if col in df.columns}}
+
+
+def merge_summaries(summaries):
+    merged = {'rows': 0, 'columns': {}}
+    for summary in summaries:
+        merged['rows'] += summary['rows']
+        for col, column_summary in summary['columns'].items():
+            merged['columns'][col] = merged['columns'][col].merge(column_summary) if col in merged['columns'] else column_summary
+    return merged
+
+
+def summary_to_dict(summary):
+    # Forme JSON, conservée dans df.attrs (donc dans le parquet préparé)
+    return {'rows': summary['rows'], 'columns': {col: s.to_dict() for col, s in summary['columns'].items()}}
+
+
+def summary_from_dict(data):
+    return {'rows': data['rows'], 'columns': {col: ColumnSummary.from_dict(s) for col, s in data['columns'].items()}}
+
+
+def dataset_summary(df):
+    # Résumé calculé à l'ingestion ; recalculé sur le DataFrame s'il manque (dataset non préparé par utils.cache)
+    if 'summary' in df.attrs:
+        return summary_from_dict(df.attrs['summary'])
+    return summarize(df)
@@ -0,0 +1,110 @@
+import numpy as np
+import shapely
+from functools import lru_cache
+from utils.io import GEOJSON_PATH
+from utils.geo import get_geometry_store
+
+# Pas de la grille de pré-classement (en degrés)
+GRID_STEP = 0.05
+
+# Cellule de la grille : -1 = hors de tout département, -2 = en bordure (test exact nécessaire),
+# >= 0 = entièrement à l'intérieur du département de cet indice
+OUTSIDE = -1
+BORDER = -2
+
+
+class DepartementIndex:
+    # Moteur d'affectation point -> département, équivalent à
+    # gpd.sjoin(points, departements, how='inner', predicate='within')
+
+    def __init__(self, geometries, codes, grid_step=GRID_STEP):
+        self.geometries = np.asarray(geometries)
+        self.codes = np.asarray(codes, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+        self.bounds = shapely.total_bounds(self.geometries)
+        self.grid_step = grid_step
+        self._build_grid()
+
+    def _build_grid(self):
+        minx, miny, maxx, maxy = self.bounds
+        step = self.grid_step
+        self.nx = max(int(np.ceil((maxx - minx) / step)), 1)
+        self.ny = max(int(np.ceil((maxy - miny) / step)), 1)
+
+        ix, iy = np.meshgrid(np.arange(self.nx), np.arange(self.ny), indexing='ij')
+        ix, iy = ix.ravel(), iy.ravel()
+        cells = shapely.box(minx + ix * step, miny + iy * step, minx + (ix + 1) * step, miny + (iy + 1) * step)
+
+        cell_idx, poly_idx = self.tree.query(cells, predicate='intersects')
+        hits = np.bincount(cell_idx, minlength=len(cells))
+
+        labels = np.full(len(cells), BORDER, dtype=np.int32)
+        labels[hits == 0] = OUTSIDE
+        # une cellule n'est tranchée d'avance que si un seul département la touche
+        # et la contient strictement (bord compris) : tout point de la cellule est alors "within"
+        single = hits[cell_idx] == 1
+        c, p = cell_idx[single], poly_idx[single]
+        inside = shapely.contains_properly(self.geometries[p], cells[c])
+        labels[c[inside]] = p[inside]
+        self.grid_labels = labels
+
+    def _grid_lookup(self, x, y):
+        minx, miny, _, _ = self.bounds
+        fx = (x - minx) / self.grid_step
+        fy = (y - miny) / self.grid_step
+        ix = np.clip(np.floor(fx).astype(np.int64), 0, self.nx - 1)
+        iy = np.clip(np.floor(fy).astype(np.int64), 0, self.ny - 1)
+        labels = self.grid_labels[ix * self.ny + iy]
+        # un point pile sur une arête de cellule (à l'arrondi près) repasse par le test exact
+        eps = 1e-9
+        on_edge = (np.abs(fx - np.rint(fx)) < eps) | (np.abs(fy - np.rint(fy)) < eps)
+        return np.where(on_edge, BORDER, labels)
+
+    def query(self, lon, lat):
+        # Renvoie (positions des points, indices des départements), triés par point puis
+        # par département comme la sortie de gpd.sjoin
+        lon = np.asarray(lon, dtype='float64')
+        lat = np.asarray(lat, dtype='float64')
+        minx, miny, maxx, maxy = self.bounds
+
+        # 1. boîte englobante : élimine d'emblée NaN et points lointains
+        candidates = np.flatnonzero((lon >= minx) & (lon <= maxx) & (lat >= miny) & (lat <= maxy))
+
+        # 2. coordonnées répétées (plusieurs PDC par station) : une seule recherche par position
+        keys = lon[candidates] + 1j * lat[candidates]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.ravel()
+        ux, uy = unique_keys.real, unique_keys.imag
+
+        # 3. grille : seuls les points proches d'une frontière passent au test exact
+        labels = self._grid_lookup(ux, uy)
+        decided = np.flatnonzero(labels >= 0)
+        border = np.flatnonzero(labels == BORDER)
+        bx, by = ux[border], uy[border]
+        # STRtree : candidats par boîte englobante, puis test exact sur les polygones préparés
+        point_idx, poly_idx = self.tree.query(shapely.points(bx, by))
+        within = shapely.contains_xy(self.geometries[poly_idx], bx[point_idx], by[point_idx])
+        point_idx, poly_idx = point_idx[within], poly_idx[within]
+
+        pair_key = np.concatenate([decided, border[point_idx]])
+        pair_poly = np.concatenate([labels[decided], poly_idx]).astype(np.int64)
+        order = np.lexsort((pair_poly, pair_key))
+        pair_key, pair_poly = pair_key[order], pair_poly[order]
+
+        # 4. redéploie les résultats des positions uniques sur toutes les lignes
+        counts = np.bincount(pair_key, minlength=len(unique_keys))
+        starts = np.cumsum(counts) - counts
+        row_counts = counts[inverse]
+        rows = np.repeat(np.arange(len(candidates)), row_counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+        polys = pair_poly[starts[inverse][rows] + offsets]
+        return candidates[rows], polys
+
+
+@lru_cache(maxsize=None)
+def get_departement_index(geojson_path=GEOJSON_PATH):
+    # Construit une fois par process (les blocs de prepare_data le réutilisent),
+    # sur la géométrie exacte du magasin de contours
+    store = get_geometry_store(geojson_path)
+    return DepartementIndex(store.geometries, store.codes)
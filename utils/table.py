@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from utils.memory import FLAG_COLUMNS, FLAGS_COLUMN, unpack_flags
+
+# Tailles de page proposées pour le tableau détaillé
+TABLE_PAGE_SIZES = [50, 100, 500]
+# Colonnes affichées par défaut (les autres restent disponibles dans la projection)
+DEFAULT_TABLE_COLUMNS = [
+    'nom_operateur', 'adresse_station', 'departement', 'puissance_nominale',
+    'categorie_puissance', 'nbre_pdc', 'condition_acces', 'date_mise_en_service',
+]
+
+
+def table_columns(df):
+    # Colonnes proposées à l'affichage, drapeaux décompactés
+    columns = [col for col in df.columns if col not in (FLAGS_COLUMN, 'geometry')]
+    if FLAGS_COLUMN in df.columns:
+        position = df.columns.get_loc(FLAGS_COLUMN)
+        columns[position:position] = FLAG_COLUMNS
+    return columns
+
+
+def page_count(n_rows, page_size):
+    return max(int(np.ceil(n_rows / page_size)), 1)
+
+
+def page_table(df, positions, page, page_size, columns):
+    # Une seule page de lignes, projetée sur les colonnes demandées, en table Arrow :
+    # la charge envoyée au navigateur dépend de la taille de page, pas de la sélection
+    start = (page - 1) * page_size
+    page_positions = positions[start:start + page_size]
+    stored = [col for col in df.columns if col in columns or (col == FLAGS_COLUMN and set(columns) & set(FLAG_COLUMNS))]
+    df_page = unpack_flags(df.take(page_positions)[stored])[columns]
+    # les catégories complètes (toutes les adresses...) ne doivent pas partir avec la page
+    for col in df_page.columns:
+        if isinstance(df_page[col].dtype, pd.CategoricalDtype):
+            df_page[col] = df_page[col].astype(df_page[col].cat.categories.dtype)
+    return pa.Table.from_pandas(df_page, preserve_index=False)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# Boîtes englobantes (lon min, lat min, lon max, lat max) des territoires où une borne est plausible
+BOUNDING_BOXES = {
+    'Metropolitan France': (-5.3, 41.3, 9.6, 51.2),
+    'Guadeloupe': (-61.9, 15.8, -60.9, 16.6),
+    'Martinique': (-61.3, 14.3, -60.8, 14.9),
+    'French Guiana': (-54.7, 2.1, -51.5, 5.8),
+    'La Réunion': (55.2, -21.4, 55.9, -20.8),
+    'Mayotte': (44.9, -13.1, 45.4, -12.6),
+}
+# Puissance nominale maximale plausible (kW) ; au-delà, une valeur qui redevient plausible une fois
+# divisée par 1000 est supposée saisie en W
+POWER_MAX_KW = 1000
+
+# Règles dans l'ordre d'application : (nom, action, description)
+RULES = [
+    ('missing_coordinates', 'rejected', "No GPS coordinates"),
+    ('zero_coordinates', 'rejected', "Coordinates (0, 0)"),
+    ('swapped_coordinates', 'repaired', "Latitude and longitude swapped (swapped back)"),
+    ('out_of_bounds', 'rejected', "Outside metropolitan France and the overseas departments"),
+    # les contours (GEOJSON_PATH) ne couvrent que les 96 départements métropolitains : un point d'outre-mer
+    # serait de toute façon écarté par le test des polygones
+    ('overseas', 'rejected', "Overseas departments (no contours in the department GeoJSON)"),
+    ('power_in_watts', 'repaired', f"Power above {POWER_MAX_KW:,} kW entered in W (divided by 1000)"),
+    ('power_implausible', 'set_missing', f"Power <= 0 or above {POWER_MAX_KW:,} kW (row kept, power set to missing)"),
+]
+# Ordre des bits des drapeaux par ligne (utils.memory.pack_masks)
+RULE_NAMES = [name for name, _, _ in RULES]
+
+
+def in_boxes(lon, lat, names=BOUNDING_BOXES):
+    inside = np.zeros(len(lon), dtype=bool)
+    for name in names:
+        lon_min, lat_min, lon_max, lat_max = BOUNDING_BOXES[name]
+        inside |= (lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) & (lat <= lat_max)
+    return inside
+
+
+def validate(df):
+    # Contrôles vectorisés avant la jointure spatiale. Renvoie le DataFrame (coordonnées inversées
+    # remises dans l'ordre, puissances en W converties), le masque des lignes dont la position est
+    # plausible (seules celles-ci passent au test des polygones) et le masque des lignes de chaque règle.
+    df_valid = df.copy(deep=False)
+    lon = df_valid['consolidated_longitude'].to_numpy(dtype='float64', na_value=np.nan)
+    lat = df_valid['consolidated_latitude'].to_numpy(dtype='float64', na_value=np.nan)
+    counts = {}
+
+    missing = np.isnan(lon) | np.isnan(lat)
+    # (0, 0) : valeur par défaut d'une saisie vide ; une longitude nulle seule est plausible (méridien de Greenwich)
+    zero = (lon == 0) & (lat == 0)
+    inside = in_boxes(lon, lat)
+    swapped = ~missing & ~zero & ~inside & in_boxes(lat, lon)
+    lon, lat = np.where(swapped, lat, lon), np.where(swapped, lon, lat)
+    inside |= swapped
+    counts['missing_coordinates'] = missing
+    counts['zero_coordinates'] = zero
+    counts['swapped_coordinates'] = swapped
+    counts['out_of_bounds'] = ~missing & ~zero & ~inside
+    counts['overseas'] = inside & ~in_boxes(lon, lat, ['Metropolitan France'])
+    inside &= ~counts['overseas']
+    if swapped.any():
+        df_valid['consolidated_longitude'] = lon
+        df_valid['consolidated_latitude'] = lat
+
+    power = df_valid['puissance_nominale'].to_numpy(dtype='float64', na_value=np.nan)
+    in_watts = (power > POWER_MAX_KW) & (power / 1000 <= POWER_MAX_KW)
+    power = np.where(in_watts, power / 1000, power)
+    implausible = (power <= 0) | (power > POWER_MAX_KW)
+    counts['power_in_watts'] = in_watts
+    counts['power_implausible'] = implausible
+    if in_watts.any() or implausible.any():
+        df_valid['puissance_nominale'] = np.where(implausible, np.nan, power)
+
+    return df_valid, inside, counts
+
+
+def rule_counts(masks):
+    return {name: int(mask.sum()) for name, mask in masks.items()}
+
+
+def merge_validation(reports):
+    merged = {name: 0 for name, _, _ in RULES}
+    for report in reports:
+        for name, rows in report.items():
+            merged[name] = merged.get(name, 0) + rows
+    return merged
+
+
+def validation_report_frame(report):
+    rows = [
+        {'Rule': name, 'Action': action, 'Rows': report.get(name, 0), 'Description': description}
+        for name, action, description in RULES
+    ]
+    return pd.DataFrame(rows, columns=['Rule', 'Action', 'Rows', 'Description'])
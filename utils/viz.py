@@ -1,48 +1,142 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-import plotly.express as px
 import json
-from utils.prep import categorize_power
+import numpy as np
+import altair as alt
+import plotly.graph_objects as go
+from utils.prep import POWER_CATEGORIES
+from utils.schema import coercion_report_frame
+from utils.validation import validation_report_frame
+from utils.geo import get_geometry_store, CHOROPLETH_VARIANT
+from utils.render import section_data
+from utils.perf import timed
+from utils.payload import display_chart
+from utils.artifacts import get_artifacts
+from utils.operators import near_duplicates
+from utils.cache import dataset_version
+from utils.filters import get_filter_index, get_filter_cache
+from utils.filter_index import SORT_COLUMNS
+from utils.table import TABLE_PAGE_SIZES, DEFAULT_TABLE_COLUMNS, table_columns, page_count, page_table
+from utils.map_grid import MAP_RAW_POINTS_MAX, cell_sizes
+from utils.cube import (
+    operator_counts, operator_power_profile, market_shares, counts_by_departement, departements,
+    top_operators_in_departement, quarterly_installations, quarterly_by_power, operator_growth,
+)
+
+# Opérateurs comparés à l'ouverture de l'onglet comparateur
+DEFAULT_COMPARED_OPERATORS = ['TOTALENERGIES', 'TESLA', 'BOUYGUES E&S']
+
+@st.fragment
+@timed
+def display_map(df, filter_result, map_grid):
+    positions = filter_result['positions']
+    detail_options = ['Auto'] + list(map_grid.resolutions)
+    detail = st.radio("Map detail:", options=detail_options, horizontal=True)
+
+    # peu de bornes : points bruts ; sinon agrégation côté serveur par cellule de grille
+    if detail == 'Auto' and len(positions) <= MAP_RAW_POINTS_MAX:
+        # st.map ne sait pas sérialiser les coordonnées float32 du dataset compact
+        df_map = df[['consolidated_latitude', 'consolidated_longitude']].take(positions).astype('float64')
+        st.map(df_map, latitude='consolidated_latitude', longitude='consolidated_longitude')
+        return
+
+    resolution = map_grid.auto_resolution(positions) if detail == 'Auto' else detail
+    cells = map_grid.aggregate(positions, resolution)
+    cells['size'] = cell_sizes(cells, map_grid.resolutions[resolution])
+    st.map(cells, latitude='latitude', longitude='longitude', size='size')
+    st.caption(
+        f"{len(positions):,} terminals aggregated into {len(cells):,} cells "
+        f"of {map_grid.resolutions[resolution]}° ({resolution} level), "
+        f"{int(cells['nb_pdc'].sum()):,} load points. Circle area is proportional to the number of terminals."
+    )
+
+
+@st.fragment
+@timed
+def display_detail_table(df, filter_result):
+    # Tableau paginé côté serveur : recherche, tri et pagination sur les positions, une page matérialisée à la fois
+    version = dataset_version(df)
+    index = get_filter_index(df, version)
+    positions = filter_result['positions']
+
+    col_search, col_sort, col_order = st.columns([2, 1, 1])
+    search = col_search.text_input("Search an operator or an address:").strip()
+    sort_column = col_sort.selectbox("Sort by:", options=['Default order'] + SORT_COLUMNS)
+    descending = col_order.radio("Order:", options=['Ascending', 'Descending'], horizontal=True) == 'Descending'
+    all_columns = table_columns(df)
+    columns = st.multiselect(
+        "Columns:",
+        options=all_columns,
+        default=[col for col in DEFAULT_TABLE_COLUMNS if col in all_columns],
+    )
+
+    if search:
+        needle = search.casefold()
+        matched = get_filter_cache().get_or_compute(
+            version, ('search', needle), lambda: index.search(needle), sizeof=lambda result: result.nbytes
+        )
+        positions = np.intersect1d(positions, matched, assume_unique=True)
+    if sort_column != 'Default order':
+        positions = index.sort(positions, sort_column, descending)
+
+    if not columns or not len(positions):
+        st.info("No rows to display.")
+        return
+
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Rows per page:", options=TABLE_PAGE_SIZES, index=1)
+    n_pages = page_count(len(positions), page_size)
+    page = col_page.number_input(f"Page (1-{n_pages:,}):", min_value=1, max_value=n_pages, value=1, step=1)
+
+    st.dataframe(page_table(df, positions, page, page_size, columns), use_container_width=True, hide_index=True)
+    start = (page - 1) * page_size
+    st.caption(f"Rows {start + 1:,}-{min(start + page_size, len(positions)):,} of {len(positions):,}")
 
-def display_overview_tab(df_filtered):
+
+@timed
+def display_overview_tab(df, filter_result, map_grid):
 
     st.header("Map of charging stations")
-    st.map(df_filtered, latitude='consolidated_latitude', longitude='consolidated_longitude')
+    display_map(df, filter_result, map_grid)
     
     st.subheader("Filtered selection statistics")
-    # KPi qui s'adapte au data filtrés: df_filtered
-    if not df_filtered.empty:
+    # KPi qui s'adapte au data filtrés, calculés une fois par combinaison de filtres (cache partagé)
+    kpis = filter_result['kpis']
+    if kpis['count']:
         kpi_d1, kpi_d2, kpi_d3 = st.columns(3)
-        kpi_d1.metric("Number of terminals selected", f"{len(df_filtered):,}")
-        kpi_d2.metric("Total load points", f"{int(df_filtered['nbre_pdc'].sum()):,}")
-        kpi_d3.metric("Average power (kW)", f"{df_filtered['puissance_nominale'].mean():.2f}")
+        kpi_d1.metric("Number of terminals selected", f"{kpis['count']:,}")
+        kpi_d2.metric("Total load points", f"{kpis['pdc']:,}")
+        kpi_d3.metric("Average power (kW)", f"{kpis['power_mean']:.2f}")
     else:
         st.warning("No terminals match the selected filters.")
 
     st.subheader("Detailed filtered data")
-    df_display = df_filtered.copy()
-    if 'geometry' in df_display.columns:
-        df_display['geometry'] = df_display['geometry'].astype(str)
-    st.dataframe(df_display)
-
-def evolution_nb_bornes(df):
-    #-----------------------Graph 1-----------------
-    st.subheader("Evolution of Terminal Installations Over Time")
-    df_time = df.dropna(subset=['date_mise_en_service'])
-    # convertit la colonne de date en un format date-heure correct, nécessaire pour le rééchantillonnage.
-    #  errors=coerce transforme tout format de date invalide en NaT.
-    df_time['date_mise_en_service'] = pd.to_datetime(df_time['date_mise_en_service'])
-
-
-    # divide by quarter ou trimestre ('Q')
-    installations_par_trimestre = df_time.set_index('date_mise_en_service').resample('Q').size()
+    display_detail_table(df, filter_result)
 
+@section_data('time_series')
+def time_series_data(cube):
+    # bornes datées, par trimestre (fin de trimestre), lues dans le cube d'agrégats (utils.cube)
+    installations_par_trimestre = quarterly_installations(cube)
     installations_par_trimestre = installations_par_trimestre[
         (installations_par_trimestre.index.year >= 2015) & 
         (installations_par_trimestre.index.year <= 2025)
     ]
     installations_par_trimestre.index.name = "Trimestre"
+
+    power_evolution_pivot = quarterly_by_power(cube)
+    power_evolution_filtered = power_evolution_pivot[power_evolution_pivot.index.year >= 2015]
+
+    parc_installe_cumul = installations_par_trimestre.cumsum()
+    #calcul al somme de toutes les bornes
+    parc_installe_cumul.name = "Total number of terminals in service"
+    return installations_par_trimestre, power_evolution_filtered, parc_installe_cumul
+
+
+@timed
+def evolution_nb_bornes(cube):
+    installations_par_trimestre, power_evolution_filtered, parc_installe_cumul = time_series_data(cube)
+    #-----------------------Graph 1-----------------
+    st.subheader("Evolution of Terminal Installations Over Time")
     st.write("This graph shows the number of new charging stations installed each quarter. There has been a clear acceleration in deployment in recent years.")
     st.line_chart(installations_par_trimestre)
     st.write("Post-2020 acceleration: We are seeing a radical change of scale. Before 2020, quarterly installations were modest. After that, they exploded, with peaks exceeding 7,000 stations per quarter, reflecting strong political and industrial will. A dynamic of “sprints”: The curve is not linear but consists of peaks and troughs. This may reflect waves of deployment linked to subsidy programs, operators' annual targets, or seasonal effects.")
@@ -51,14 +145,6 @@ def evolution_nb_bornes(df):
 
     # ------------------- GRAPH 2-------------------------
     st.subheader("Evolution timeline by power category")
-    df_time['categorie_puissance'] = df_time['puissance_nominale'].apply(categorize_power)
-    power_evolution = df_time.groupby([pd.Grouper(key='date_mise_en_service', freq='Q'), 'categorie_puissance']).size().reset_index(name='count')
-    power_evolution_pivot = power_evolution.pivot(index='date_mise_en_service', columns='categorie_puissance', values='count').fillna(0)
-
-    category_order = ["Slow (< 22 kW)","Fast (22-50 kW)", "Rapid (50-150 kW)", "Ultra-Fast (>= 150 kW)"]
-    power_evolution_pivot = power_evolution_pivot.reindex(columns=category_order, fill_value=0)
-    
-    power_evolution_filtered = power_evolution_pivot[power_evolution_pivot.index.year >= 2015]
     
     st.write("This chart shows the composition of the network over time. There has been a marked increase in the proportion of fast and ultra-fast charging stations in recent years, a sign of the network's maturity.")
     st.area_chart(power_evolution_filtered)
@@ -70,9 +156,6 @@ The explosion of “fast”: From 2021 onwards, the share of fast and ultra-fast
 
         # ----------------------------- GRAPH 3----------------------- ---
     st.subheader("Cumulative growth in the number of terminals")
-    parc_installe_cumul = installations_par_trimestre.cumsum()
-    #calcul al somme de toutes les bornes
-    parc_installe_cumul.name = "Total number of terminals in service"
 
     st.write("""This curve shows the evolution of the total number of terminals in service over time. We can see growth accelerating sharply from 2020-2021.""")
         
@@ -82,33 +165,37 @@ The “S” curve of innovation: We can clearly see the signature of a technolog
 A staggering change of scale: The number of charging stations has more than doubled in just two or three years, from around 40,000 to over 100,000. This is tangible proof that the transition is underway.
 Transition Question: This impressive growth is no accident. But who are the players, the “builders” behind these figures? We will explore this in the next tab.""")
 
-def display_top_op(df_filtered):
+@section_data('top_operators')
+def top_operators_data(cube):
+    top_10_operateurs = operator_counts(cube).index[:10]
+    # comptes déjà agrégés par opérateur et catégorie de puissance : quelques dizaines de lignes envoyées au navigateur
+    return operator_power_profile(cube, top_10_operateurs)
+
+
+@timed
+def display_top_op(cube):
     st.subheader("Power profile of the 10 largest operators")
-    top_10_operateurs = df_filtered['nom_operateur'].value_counts().nlargest(10).index
-        
-    df_top10 = df_filtered[df_filtered['nom_operateur'].isin(top_10_operateurs)]
-    # Créer un nouevelle colonne pour faciliter la visualisation basé sur les catégories de la fonction catagegorize_power dans utils.prep.py    
-    df_top10['categorie_puissance'] = df_top10['puissance_nominale'].apply(categorize_power)
+    df_top10 = top_operators_data(cube)
 
     chart = alt.Chart(df_top10).mark_bar().encode(
         x=alt.X('nom_operateur:N', title='Operator'),  
-        y=alt.Y('count():Q', title='Number of Terminals'),
+        y=alt.Y('nb_bornes:Q', title='Number of Terminals'),
             
-        xOffset='categorie_puissance:N',# xOffset crée l'effet groupé
+        xOffset=alt.XOffset('categorie_puissance:N', sort=POWER_CATEGORIES),# xOffset crée l'effet groupé
 
         #  couleur différente à chaque catégorie de puissance
         color=alt.Color('categorie_puissance:N',
                         title='Power Category',
-                        sort=["Lente (< 22 kW)", "Accélérée (22-50 kW)", "Rapide (50-150 kW)", "Ultra-rapide (>= 150 kW)"]),
+                        sort=POWER_CATEGORIES),
             
-        tooltip=['nom_operateur', 'categorie_puissance', 'count()']
+        tooltip=['nom_operateur', 'categorie_puissance', 'nb_bornes']
             
     ).properties(
         title="Breakdown of the fleet by power for the Top 10"
     )
         
     st.write("""This graph reveals the strategies of the main players. Some, such as Tesla, focus almost exclusively on ultra-fast charging, while others offer a more varied mix to cover different needs (city, highway, etc.).”""") 
-    st.altair_chart(chart, use_container_width=True)
+    display_chart(chart)
 
     st.write("""This chart is the centerpiece. It does not cover the entire market, but focuses on the 10 most influential players in order to analyze their strategy.
 Two Leadership Models: The graph highlights two distinct strategies for domination. On the one hand, Bouygues E&S and Freshmile base their leadership on volume, with a huge fleet of “Slow” and “Accelerated” charging stations. Their strength lies in their local network coverage (cities, car parks).
@@ -116,19 +203,19 @@ The Race for Power: On the other hand, players such as Power Dot and Tesla are p
 Players such as Lidl and TotalEnergie illustrate a third approach: integrating charging as a customer service. Their networks, although substantial, offer a mix of power levels designed to attract customers while they shop.""") 
     st.write("---") 
 
-def camembert_op(df):
-    st.subheader("Overall distribution of terminals by operator (market share for France as a whole)")
-    op_counts = df['nom_operateur'].value_counts()
-        
-    top_10_op = op_counts.nlargest(10)
-    # Calcule la somme de toutes les bornes des opérateurs qui ne sont pas dans le top 10
-    autres_sum = op_counts.iloc[10:].sum()
-        
-    if autres_sum > 0:
-        top_10_op['Others'] = autres_sum
-            
+@section_data('market_shares')
+def market_shares_data(cube):
+    # top 10 + 'Others' (somme des opérateurs hors top 10)
+    top_10_op = market_shares(cube, 10)
     df_pie = top_10_op.reset_index()# Transforme la série en un DataFrame pour qu'il soit utilisable par Altair.
     df_pie.columns = ['Opérateur', 'Nombre de Bornes']
+    return df_pie
+
+
+@timed
+def camembert_op(cube):
+    st.subheader("Overall distribution of terminals by operator (market share for France as a whole)")
+    df_pie = market_shares_data(cube)
 
     chart_pie = alt.Chart(df_pie).mark_arc(innerRadius=70, outerRadius=120).encode(
             theta=alt.Theta(field="Nombre de Bornes", type="quantitative"),#angle de chaque part du camembert proportionnel au nombre de bornes
@@ -139,14 +226,20 @@ def camembert_op(df):
         title="Overall market shares of the top 10 operators"
     )
     st.write("This graph shows market concentration across the entire territory. It remains fixed to serve as a reference, regardless of the filters applied.")
-    st.altair_chart(chart_pie, use_container_width=True)
+    display_chart(chart_pie)
 
-def display_top_departements_chart(df):
+@section_data('departement_counts')
+def departement_counts_data(cube):
+    departement_counts = counts_by_departement(cube)# Compte le nombre de bornes pour chaque département
+    departement_counts.columns = ['departement', 'Nombre de Bornes']
+    return departement_counts
+
+
+@timed
+def display_top_departements_chart(cube):
 
     st.subheader("Density of terminals by department")
-    departement_counts = df['departement'].value_counts().reset_index()
-    departement_counts.columns = ['departement', 'Nombre de Bornes']
-    departement_counts = departement_counts.sort_values('Nombre de Bornes', ascending=False)
+    departement_counts = departement_counts_data(cube)
 
     # Afficher un graphique en barres en attendant
     st.write("Top 20 departments with the most charging stations:")
@@ -162,45 +255,48 @@ def display_top_departements_chart(df):
         title="Best-equipped departments"
     )
             
-    st.altair_chart(chart_bar, use_container_width=True)
+    display_chart(chart_bar)
  
-def display_carte_by_depart(df):
-    st.header("Analysis of the geographic distribution of terminals")
-    st.subheader("Map showing the density of terminals by department")
-
-    if 'departement' in df.columns:
-        # Ouvre et charge le fichier GeoJSON qui contient les contours des départements
-        with open("data/departements-version-simplifiee.geojson", 'r', encoding='utf-8') as f:
-            geojson_data = json.load(f)
-
-        departement_counts = df['departement'].value_counts().reset_index()# Compte le nombre de bornes pour chaque département
-        departement_counts.columns = ['departement', 'Nombre de Bornes']
-
-        # Crée la figure choroplèthe avec Plotly Express.
-        fig = px.choropleth(
-            departement_counts,
-            geojson=geojson_data,
-            locations='departement',# La colonne des données qui sert de clé de jointure
-            featureidkey="properties.code",# Le chemin vers la clé de jointure dans le fichier GeoJSON
-            color='Nombre de Bornes',
-            color_continuous_scale='RdYlBu_r',  
-            range_color=(0, departement_counts['Nombre de Bornes'].max()),
-        )
-        fig.update_geos(
-            fitbounds="locations",# Zoome automatiquement la carte sur la France
-            bgcolor='#0d1117',
-        )
-
-        # MAJ les paramètres généraux de mise en page de la figure
-        fig.update_layout(
-            height=700,
-            margin={"r": 20, "t": 30, "l": 20, "b": 20},
-            paper_bgcolor='#0d1117',
-            plot_bgcolor='#0d1117',
-            font=dict(color='#c9d1d9', size=13),
+def choropleth_geojson(variant):
+    # Contours simplifiés écrits par le build hors ligne, sinon calculés depuis le GeoJSON source
+    artifacts = get_artifacts()
+    if artifacts is not None:
+        with open(artifacts.geojson_path(variant), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return get_geometry_store().geojson(variant)
+
+
+@st.cache_resource
+def get_choropleth_base(variant=CHOROPLETH_VARIANT):
+    # Couche statique de la carte (contours simplifiés, mise en page), construite une fois par process.
+    # Renvoyée sous forme de dict : chaque rerun ne remplace que le vecteur des comptages.
+    fig = go.Figure(go.Choropleth(
+        geojson=choropleth_geojson(variant),
+        featureidkey="properties.code",# Le chemin vers la clé de jointure dans le fichier GeoJSON
+        locations=[],
+        z=[],
+        coloraxis='coloraxis',
+        hovertemplate="departement=%{location}<br>Nombre de Bornes=%{z}<extra></extra>",
+        marker_line_color='rgba(255,255,255,0.3)',
+        marker_line_width=1,
+    ))
+    fig.update_geos(
+        fitbounds="locations",# Zoome automatiquement la carte sur la France
+        bgcolor='#0d1117',
+    )
 
+    # MAJ les paramètres généraux de mise en page de la figure
+    fig.update_layout(
+        height=700,
+        margin={"r": 20, "t": 30, "l": 20, "b": 20},
+        paper_bgcolor='#0d1117',
+        plot_bgcolor='#0d1117',
+        font=dict(color='#c9d1d9', size=13),
+        coloraxis=dict(
+            colorscale='RdYlBu_r',
+            cmin=0,
             # Personnalise l'apparence de la légende de couleur
-            coloraxis_colorbar=dict(
+            colorbar=dict(
                 title=dict(text="Number of terminals", font=dict(color='white', size=14)),
                 thickness=20,
                 len=0.6,
@@ -209,15 +305,63 @@ def display_carte_by_depart(df):
                 bordercolor='#30363d',
                 borderwidth=2,
                 tickfont=dict(color='white')
-            )
-        )
-        fig.update_traces(
-            marker_line_color='rgba(255,255,255,0.3)',
-            marker_line_width=1
+            ),
+        ),
+    )
+    return fig.to_dict()
+
+
+def choropleth_figure(base, locations, values):
+    # Copie superficielle : la géométrie de la couche de base est partagée, pas recopiée
+    trace = dict(base['data'][0], locations=list(locations), z=list(values))
+    coloraxis = dict(base['layout']['coloraxis'], cmax=max(values, default=0))
+    return dict(base, data=[trace], layout=dict(base['layout'], coloraxis=coloraxis))
+
+
+@timed
+def display_carte_by_depart(cube):
+    st.header("Analysis of the geographic distribution of terminals")
+    st.subheader("Map showing the density of terminals by department")
+
+    if 'departement' in cube.columns:
+        departement_counts = departement_counts_data(cube)
+
+        # Contours lus une seule fois (utils.geo) : seul le nombre de bornes change d'un rerun à l'autre
+        fig = choropleth_figure(
+            get_choropleth_base(),
+            departement_counts['departement'],
+            departement_counts['Nombre de Bornes'].tolist(),
         )
         st.plotly_chart(fig, use_container_width=True)
 
+@section_data('preprocessing')
+def preprocessing_data(df):
+    missing_dates = df['date_mise_en_service'].isnull().sum()
+    df_missing_info = pd.DataFrame({
+        'Information': ["missing data_mise_en_service"],
+        'Number of missing values': [f"{missing_dates:,}"]
+    })
+
+    coercion_report = df.attrs.get('coercion_report', {})
+    df_coercion = coercion_report_frame(coercion_report) if coercion_report else None
+
+    validation_report = df.attrs.get('validation_report')
+    df_validation = validation_report_frame(validation_report) if validation_report else None
+
+    memory = df.attrs.get('memory_report')
+    df_memory = None
+    if memory:
+        df_memory = pd.DataFrame.from_dict(memory, orient='index', columns=['Before (bytes)', 'After (bytes)'])
+        df_memory['Ratio'] = (df_memory['Before (bytes)'] / df_memory['After (bytes)']).round(1)
+    # quasi-doublons parmi les noms d'opérateurs canoniques (calculés sur les valeurs distinctes)
+    op_counts = df['nom_operateur'].value_counts()
+    df_near_duplicates = near_duplicates(op_counts.index.astype(str), op_counts.to_numpy())
+    return df_missing_info, df_coercion, df_validation, df_memory, df_near_duplicates
+
+
+@timed
 def display_datapreprocessing(df):
+    df_missing_info, df_coercion, df_validation, df_memory, df_near_duplicates = preprocessing_data(df)
     st.subheader("Main preparation steps")
 #----------------------------- PART 1 --------------------------------------------------
     st.markdown("#### 1. Column selection and handling of missing values")
@@ -241,12 +385,6 @@ df_prepared['paiement_acte'].fillna(False, inplace=True)
     """, language='python')
 
     # -------------------------- MISSING DATA_MISE_EN_SERVICE----------------------------------------
-    missing_dates = df['date_mise_en_service'].isnull().sum()
-    df_missing_info = pd.DataFrame({
-        'Information': ["missing data_mise_en_service"],
-        'Number of missing values': [f"{missing_dates:,}"]
-    })
-
     st.dataframe(df_missing_info, use_container_width=True, hide_index=True)
 
     st.info(
@@ -260,16 +398,28 @@ df_prepared['paiement_acte'].fillna(False, inplace=True)
         "One of the biggest challenges was the inconsistency of operator names. The same player, such as ‘TotalEnergies’, appeared under several different names. So I applied a comprehensive mapping dictionary to group all the variants under a single, unique name.")
     st.code("""
 
-mapping_operateurs = {
+EXACT_RULES = {
     'TOTALENERGIES CHARGING SERVICES': 'TOTALENERGIES',
     'TOTALENERGIES MARKETING FRANCE': 'TOTALENERGIES',
     'BOUYGUES ENERGIES & SERVICES': 'BOUYGUES E&S',
     'TESLA FRANCE SARL': 'TESLA',
     # ... 
 }
-df_prepared['nom_operateur'] = df_prepared['nom_operateur'].replace(mapping_operateurs)
+PREFIX_RULES = {'ALDI MARCHE ': 'ALDI'}
+REGEX_RULES = [(r"^BOUYGUES ENERGIES?\\s*(&|ET)?\\s*SERVICES\\b", 'BOUYGUES E&S')]
+
+# une normalisation par nom distinct, redéployée sur les lignes par leurs codes
+codes, uniques = pd.factorize(df_prepared['nom_operateur'].fillna('Opérateur non spécifié'))
+canonical = np.array([engine.canonical_name(raw)[0] for raw in uniques], dtype=object)
+df_prepared['nom_operateur'] = canonical[codes]
     """, language='python')
 
+    if df_near_duplicates is not None and not df_near_duplicates.empty:
+        st.markdown(
+            "Operator names that are still very close after standardization (same words once case, accents, "
+            "punctuation and legal forms are ignored). They are candidates for the alias table (`data/operator_aliases.csv`):")
+        st.dataframe(df_near_duplicates, use_container_width=True, hide_index=True)
+
 #-----------------------------PART 3---------------------------------------
     st.markdown("#### 3. Geographic Enrichment through Spatial Joining")
     st.markdown(
@@ -277,11 +427,22 @@ df_prepared['nom_operateur'] = df_prepared['nom_operateur'].replace(mapping_oper
     st.info("vector maps of departments: https://github.com/gregoiredavid/france-geojson")
     st.code("""
 
-gdf_bornes = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(...))
-gdf_departements = gpd.read_file(...)
-gdf_final = gpd.sjoin(gdf_bornes, gdf_departements, ...)
+# équivalent de gpd.sjoin(gdf_bornes, gdf_departements, predicate='within'),
+# via un STRtree de polygones préparés et une grille de pré-classement
+index_departements = get_departement_index("data/departements-version-simplifiee.geojson")
+rows, polys = index_departements.query(df['consolidated_longitude'], df['consolidated_latitude'])
+df_final = df.iloc[rows].copy()
+df_final['departement'] = index_departements.codes[polys]
     """, language='python')
 
+    if df_validation is not None:
+        st.markdown(
+            "Before the join, vectorized checks reject or repair implausible rows: zero or missing coordinates, "
+            "latitude / longitude swaps, points outside France and its overseas departments, overseas points "
+            "(the department contours cover metropolitan France only), and power ratings entered in W instead "
+            "of kW. Implausible power ratings are set to missing. Only plausible points reach the polygon test:")
+        st.dataframe(df_validation, use_container_width=True, hide_index=True)
+
 # ------------------------ PART 4------------------------------------------------------
     st.markdown("#### 4. Type Conversion and Variable Creation")
     st.markdown("""
@@ -291,41 +452,71 @@ gdf_final = gpd.sjoin(gdf_bornes, gdf_departements, ...)
     )
     st.code("""
 
-df_prepared['date_mise_en_service'] = pd.to_datetime(df_prepared['date_mise_en_service'], errors='coerce')
-df_prepared['puissance_nominale'] = pd.to_numeric(df_prepared['puissance_nominale'], errors='coerce')
+SCHEMA = {
+    'puissance_nominale': 'numeric',      # pd.to_numeric(errors='coerce')
+    'date_mise_en_service': 'date',       # format '%Y-%m-%d'
+    'prise_type_2': 'bool',               # true/false/1/0
+    'nbre_pdc': 'int',                    # entier nullable
+    # ...
+}
+raw = load_data(path, usecols=colonnes_a_garder, dtype=read_dtypes())
+df_prepared, coercion_report = apply_schema(raw[colonnes_a_garder])
 
-cols_to_normalize = [
-        'prise_type_ef', 'prise_type_2', 'prise_type_combo_ccs', 
-        'prise_type_chademo', 'prise_type_autre',
-        'paiement_acte', 'paiement_cb', 'paiement_autre'
-    ]
-    true_values = ['true', '1']
-    for col in cols_to_normalize:
-        if col in df_prepared.columns:
-            df_prepared[col] = df_prepared[col].str.lower().isin(true_values)
+POWER_CATEGORIES = ["Slow (< 22 kW)", "Fast (22-50 kW)", "Rapid (50-150 kW)", "Ultra-Fast (>= 150 kW)"]
+POWER_BINS = [22, 50, 150]
 
 def categorize_power(power):
-    if power < 22: return "Slow (< 22 kW)"
-    elif power < 22:
-        return "Slow (< 22 kW)"
-    elif 22 <= power < 50:
-        return "Fast (22-50 kW)"
-    elif 50 <= power < 150:
-        return "Rapid (50-150 kW)"
-    else: 
-        return "Ultra-Fast (>= 150 kW)"
+    values = power.to_numpy(dtype='float64', na_value=np.nan)
+    codes = np.searchsorted(POWER_BINS, values, side='right')
+    codes[np.isnan(values)] = 0
+    return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(POWER_CATEGORIES, ordered=True))
+
+df_prepared['categorie_puissance'] = categorize_power(df_prepared['puissance_nominale'])
     """, language='python')
 
-def display_top_operators_by_department_chart(df):
+    if df_coercion is not None:
+        st.markdown("Values that could not be converted to their expected type (kept as missing values):")
+        st.dataframe(df_coercion, use_container_width=True, hide_index=True)
+
+    # ------------------------ PART 5------------------------------------------------------
+    if df_memory is not None:
+        st.markdown("#### 5. Compact storage")
+        st.markdown(
+            "Once prepared, the dataset is stored compactly: repeated texts (operators, departments, addresses) as categories, "
+            "coordinates and power as 32-bit floats, and the eight plug/payment flags packed into a single byte.")
+        st.dataframe(df_memory, use_container_width=True)
+
+    ingest = df.attrs.get('ingest_report')
+    if ingest:
+        st.caption(
+            f"Last incremental refresh: {ingest['inserted']:,} rows inserted, {ingest['updated']:,} updated, "
+            f"{ingest['deleted']:,} deleted, {ingest['unchanged']:,} unchanged (not re-prepared)."
+        )
+
+@section_data('departement_list')
+def departement_list_data(cube):
+    return departements(cube)#tri les departements
+
+
+@section_data('departement_top_operators')
+def departement_top_operators_data(cube, departement):
+    top_5_op = top_operators_in_departement(cube, departement, 5).reset_index()# on selecte les 5 premiers
+    top_5_op.columns = ['Opérateur', 'Nombre de Bornes']
+    return top_5_op
+
+
+@st.fragment
+@timed
+def display_top_operators_by_department_chart(cube):
 
     st.subheader("Top 5 operators by department")
     st.write("Use the drop-down menu below to explore the ranking of operators in a specific department")
-    if 'departement' not in df.columns: #check que la colonne 'departement' existe bien.
+    if 'departement' not in cube.columns: #check que la colonne 'departement' existe bien.
         st.error("The ‘department’ column cannot be found.")
         return
 
 
-    departement_list = sorted(df['departement'].unique())#tri les departements
+    departement_list = departement_list_data(cube)
     
     selected_dept = st.selectbox(#choix de user
         "Select a department:",
@@ -337,9 +528,7 @@ def display_top_operators_by_department_chart(df):
    
     if selected_dept: # a partir du choix du user .......
         
-        df_dept = df[df['departement'] == selected_dept]
-        top_5_op = df_dept['nom_operateur'].value_counts().nlargest(5).reset_index()# on selecte les 5 premiers
-        top_5_op.columns = ['Opérateur', 'Nombre de Bornes']
+        top_5_op = departement_top_operators_data(cube, selected_dept)
 
         if not top_5_op.empty:
             chart = alt.Chart(top_5_op).mark_bar().encode(
@@ -348,11 +537,26 @@ def display_top_operators_by_department_chart(df):
             ).properties(
                 title=f"Top 5 operators in the department {selected_dept}"
             )
-            st.altair_chart(chart, use_container_width=True)
+            display_chart(chart)
         else:
             st.info(f"No terminal data was found for the department. {selected_dept}.")
 
-def display_operator_comparator_tab(df, categorize_power_func):
+@section_data('operator_list')
+def operator_list_data(cube):
+    return sorted(cube['nom_operateur'].astype(str).unique())
+
+
+@section_data('operator_comparison')
+def operator_comparison_data(cube, operators):
+    growth_data = operator_growth(cube, list(operators))
+    if not growth_data.empty:
+        growth_data = growth_data[growth_data['trimestre'].dt.year >= 2015]# à partir de 2015
+    return operator_power_profile(cube, list(operators)), growth_data
+
+
+@st.fragment
+@timed
+def display_operator_comparator_tab(cube):
    
     st.header("Operator Comparison Tool")
     st.write(
@@ -361,13 +565,13 @@ def display_operator_comparator_tab(df, categorize_power_func):
     )
     
     # liste de tous les opérateurs uniques.
-    operator_list = sorted(df['nom_operateur'].unique())
+    operator_list = operator_list_data(cube)
     st.info("Select up to 3 operators to compare")
 
     # widget multiselec avec 3 choix 
     selected_operators = st.multiselect("Choose:",
         options=operator_list,
-        default=['TOTALENERGIES', 'TESLA', 'BOUYGUES E&S'],
+        default=[op for op in DEFAULT_COMPARED_OPERATORS if op in operator_list],
         placeholder="Select operators",
         max_selections=3  
     )
@@ -376,42 +580,34 @@ def display_operator_comparator_tab(df, categorize_power_func):
 
 
     if selected_operators:# check si user select au moins un opérateur
-        df_selection = df[df['nom_operateur'].isin(selected_operators)].copy()
-
+        df_power, growth_data = operator_comparison_data(cube, tuple(selected_operators))
         col1, col2 = st.columns(2)#pour afficher les graphiques à coté 
 
         with col1:
             # ------------------------GRAPHIQUE 1 --------------------------------
             st.subheader("Composition of the fleet by power")
-            df_selection['categorie_puissance'] = df_selection['puissance_nominale'].apply(categorize_power_func)
-            
-            chart_power = alt.Chart(df_selection).mark_bar().encode(
+            chart_power = alt.Chart(df_power).mark_bar().encode(
                 x=alt.X('nom_operateur:N', title='Operator', sort='-y'),#sort='-y' trie les opérateurs par nombre total de bornes
-                y=alt.Y('count():Q', title='Number of Terminals'),
+                y=alt.Y('nb_bornes:Q', title='Number of Terminals'),
                 color=alt.Color('categorie_puissance:N', 
                               title='Power Category',
-                              sort=["Lente (< 22 kW)", "Accélérée (22-50 kW)", "Rapide (50-150 kW)", "Ultra-rapide (>= 150 kW)"])
+                              sort=POWER_CATEGORIES)
             ).properties(height=400)
-            st.altair_chart(chart_power, use_container_width=True)
+            display_chart(chart_power)
 
         with col2:
             # -----------------------------GRAPHIQUE 2 ---------------------------------
             st.subheader("Growth Dynamics")
-            df_growth = df_selection.dropna(subset=['date_mise_en_service'])# Supprime les bornes sans date 
+            # Parc cumulé par opérateur ET par trimestre (bornes datées uniquement)
             
-            if not df_growth.empty:## Vérifie si il reste bien des rows
-                growth_data = df_growth.groupby(['nom_operateur', pd.Grouper(key='date_mise_en_service', freq='QE')]).size().reset_index(name='installations')
-                # Groupe les données par opérateur ET par trimestre ('QE' = Quarter End).
-                growth_data['parc_cumulé'] = growth_data.groupby('nom_operateur')['installations'].cumsum()
-                growth_data = growth_data[growth_data['date_mise_en_service'].dt.year >= 2015]# à partir de 2015
-
+            if not growth_data.empty:## Vérifie si il reste bien des rows
                 chart_growth = alt.Chart(growth_data).mark_line().encode(
-                    x=alt.X('date_mise_en_service:T', title='Date'),
+                    x=alt.X('trimestre:T', title='Date'),
                     y=alt.Y('parc_cumulé:Q', title='Total number of terminals'),
                     color=alt.Color('nom_operateur:N', title='Operator'),
-                    tooltip=['nom_operateur', 'date_mise_en_service', 'parc_cumulé']# Info-bulle,display ces informations sous la souris.
+                    tooltip=['nom_operateur', 'trimestre', 'parc_cumulé']# Info-bulle,display ces informations sous la souris.
                 ).properties(height=400)
-                st.altair_chart(chart_growth, use_container_width=True)
+                display_chart(chart_growth)
             else:
                 st.info("No time data available for this selection.")
     